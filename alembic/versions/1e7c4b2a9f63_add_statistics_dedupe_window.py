@@ -0,0 +1,26 @@
+"""add statistics dedupe window
+
+Revision ID: 1e7c4b2a9f63
+Revises: 6d2e9a4c8b15
+Create Date: 2026-10-17 04:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e7c4b2a9f63'
+down_revision: Union[str, None] = '6d2e9a4c8b15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('statistics_config', sa.Column('dedupe_window', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('statistics_config', 'dedupe_window')
@@ -0,0 +1,30 @@
+"""add scream backfill cutoff
+
+Revision ID: 2b8e5d1f4c96
+Revises: 9f4d2b7e6a31
+Create Date: 2026-10-17 06:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b8e5d1f4c96'
+down_revision: Union[str, None] = '9f4d2b7e6a31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('scream_backfill', sa.Column('cutoff_id', sa.BigInteger(), nullable=True))
+    op.add_column(
+        'scream_backfill_users', sa.Column('baseline_total', sa.Integer(), nullable=False, server_default='0')
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('scream_backfill_users', 'baseline_total')
+    op.drop_column('scream_backfill', 'cutoff_id')
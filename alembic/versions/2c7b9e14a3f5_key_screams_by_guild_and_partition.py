@@ -0,0 +1,108 @@
+"""key screams by guild and partition
+
+Revision ID: 2c7b9e14a3f5
+Revises: 8e41f0c2d7a6
+Create Date: 2026-10-17 01:40:00.000000
+
+The counters used to be global, shared by every guild with the statistics cog set up. By default every
+configured guild gets a copy of every user's counters, including guilds the user was never in, so each guild
+keeps showing the stats it was showing. To give the counters to a single guild instead, pass its id:
+
+    alembic -x main_guild=<guild id> upgrade head
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c7b9e14a3f5'
+down_revision: Union[str, None] = '8e41f0c2d7a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS = 8
+COLUMNS = "user_id, total, streak, streak_last, best_streak, daily, streak_keeper"
+
+
+def _create_indexes(leaderboard_columns: Sequence[str], prefix: Sequence[str]) -> None:
+    for column in leaderboard_columns:
+        name = f"ix_screams_guild_{column}" if prefix else f"ix_screams_{column}"
+        op.create_index(name, 'screams', [*prefix, column], unique=False)
+    op.create_index(
+        'ix_screams_daily_streaking', 'screams', ['daily'], unique=False, postgresql_where=sa.text('streak > 0')
+    )
+
+
+def upgrade() -> None:
+    # tables created from the models before streak_last was declared properly don't have the column
+    op.execute('ALTER TABLE screams ADD COLUMN IF NOT EXISTS streak_last INT NOT NULL DEFAULT 0')
+    op.rename_table('screams', 'screams_legacy')
+    op.execute('ALTER TABLE screams_legacy RENAME CONSTRAINT screams_pkey TO screams_legacy_pkey')
+    op.drop_index('ix_screams_total', table_name='screams_legacy', if_exists=True)
+    op.drop_index('ix_screams_streak', table_name='screams_legacy', if_exists=True)
+    op.drop_index('ix_screams_best_streak', table_name='screams_legacy', if_exists=True)
+    op.drop_index('ix_screams_daily_streaking', table_name='screams_legacy', if_exists=True)
+
+    op.create_table(
+        'screams',
+        sa.Column('guild_id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('streak', sa.Integer(), nullable=False),
+        sa.Column('streak_last', sa.Integer(), nullable=False),
+        sa.Column('best_streak', sa.Integer(), nullable=False),
+        sa.Column('daily', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('streak_keeper', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('guild_id', 'user_id'),
+        postgresql_partition_by='HASH (guild_id)',
+    )
+    for remainder in range(PARTITIONS):
+        op.execute(
+            f'CREATE TABLE screams_p{remainder} PARTITION OF screams '
+            f'FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})'
+        )
+    _create_indexes(['total', 'streak', 'best_streak'], ['guild_id'])
+
+    # see the module docstring, the counters go to the main guild if one is given, otherwise to every guild
+    main_guild = op.get_context().get_x_argument(as_dictionary=True).get('main_guild')
+    if main_guild is not None:
+        op.execute(
+            sa.text(f'INSERT INTO screams (guild_id, {COLUMNS}) SELECT :guild_id, {COLUMNS} FROM screams_legacy')
+            .bindparams(sa.bindparam('guild_id', int(main_guild), type_=sa.BigInteger()))
+        )
+    else:
+        op.execute(
+            f'INSERT INTO screams (guild_id, {COLUMNS}) '
+            f'SELECT config.guild_id, {COLUMNS} FROM screams_legacy CROSS JOIN statistics_config AS config'
+        )
+    op.drop_table('screams_legacy')
+
+
+def downgrade() -> None:
+    op.rename_table('screams', 'screams_partitioned')
+    op.execute('ALTER TABLE screams_partitioned RENAME CONSTRAINT screams_pkey TO screams_partitioned_pkey')
+    op.drop_index('ix_screams_daily_streaking', table_name='screams_partitioned')
+
+    op.create_table(
+        'screams',
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('streak', sa.Integer(), nullable=False),
+        sa.Column('streak_last', sa.Integer(), nullable=False),
+        sa.Column('best_streak', sa.Integer(), nullable=False),
+        sa.Column('daily', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('streak_keeper', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    _create_indexes(['total', 'streak', 'best_streak'], [])
+
+    # a user in several guilds keeps the stats of the guild they screamed the most in
+    op.execute(
+        f'INSERT INTO screams ({COLUMNS}) '
+        f'SELECT DISTINCT ON (user_id) {COLUMNS} FROM screams_partitioned ORDER BY user_id, total DESC'
+    )
+    # dropping the partitioned table drops its partitions
+    op.drop_table('screams_partitioned')
@@ -0,0 +1,32 @@
+"""add statistics channels
+
+Revision ID: 3b6f1d8e5a47
+Revises: 7a5e3b9d2c18
+Create Date: 2026-10-17 03:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b6f1d8e5a47'
+down_revision: Union[str, None] = '7a5e3b9d2c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'statistics_channels',
+        sa.Column('guild_id', sa.BigInteger(), nullable=False),
+        sa.Column('channel_id', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('guild_id', 'channel_id'),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('statistics_channels')
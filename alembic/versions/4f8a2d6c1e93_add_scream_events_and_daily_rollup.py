@@ -0,0 +1,53 @@
+"""add scream events and daily rollup
+
+Revision ID: 4f8a2d6c1e93
+Revises: 2c7b9e14a3f5
+Create Date: 2026-10-17 02:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f8a2d6c1e93'
+down_revision: Union[str, None] = '2c7b9e14a3f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'scream_events',
+        sa.Column('id', sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column('guild_id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('created', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('daily', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'scream_daily',
+        sa.Column('guild_id', sa.BigInteger(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('screams', sa.Integer(), nullable=False),
+        sa.Column('screamers', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('guild_id', 'day'),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'rollup_state',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('last_id', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rollup_state')
+    op.drop_table('scream_daily')
+    op.drop_table('scream_events')
@@ -0,0 +1,35 @@
+"""add reminder indexes
+
+Revision ID: 5c8a3f1b7d24
+Revises: 1e7c4b2a9f63
+Create Date: 2026-10-17 04:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c8a3f1b7d24'
+down_revision: Union[str, None] = '1e7c4b2a9f63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_reminders_due',
+        'reminders',
+        ['send_time', 'id'],
+        unique=False,
+        postgresql_where=sa.text('NOT repeat'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_reminders_user_send_time', 'reminders', ['user_id', 'send_time'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reminders_user_send_time', table_name='reminders', if_exists=True)
+    op.drop_index('ix_reminders_due', table_name='reminders', if_exists=True)
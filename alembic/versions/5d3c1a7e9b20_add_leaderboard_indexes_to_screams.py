@@ -0,0 +1,30 @@
+"""add leaderboard indexes to screams
+
+Revision ID: 5d3c1a7e9b20
+Revises: af162e382559
+Create Date: 2026-10-17 01:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d3c1a7e9b20'
+down_revision: Union[str, None] = 'af162e382559'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # the statistics cog creates the table (and these indexes) itself on a fresh database
+    op.create_index('ix_screams_total', 'screams', ['total'], unique=False, if_not_exists=True)
+    op.create_index('ix_screams_streak', 'screams', ['streak'], unique=False, if_not_exists=True)
+    op.create_index('ix_screams_best_streak', 'screams', ['best_streak'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_screams_best_streak', table_name='screams', if_exists=True)
+    op.drop_index('ix_screams_streak', table_name='screams', if_exists=True)
+    op.drop_index('ix_screams_total', table_name='screams', if_exists=True)
@@ -0,0 +1,41 @@
+"""add scream outbox
+
+Revision ID: 6d2e9a4c8b15
+Revises: 3b6f1d8e5a47
+Create Date: 2026-10-17 03:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d2e9a4c8b15'
+down_revision: Union[str, None] = '3b6f1d8e5a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'scream_outbox',
+        sa.Column('id', sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column('guild_id', sa.BigInteger(), nullable=False),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('channel_id', sa.BigInteger(), nullable=True),
+        sa.Column('user_id', sa.BigInteger(), nullable=True),
+        sa.Column('role_id', sa.BigInteger(), nullable=True),
+        sa.Column('content', sa.String(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('not_before', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_scream_outbox_not_before', 'scream_outbox', ['not_before'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_scream_outbox_not_before', table_name='scream_outbox')
+    op.drop_table('scream_outbox')
@@ -0,0 +1,48 @@
+"""add scream backfill checkpoints
+
+Revision ID: 7a5e3b9d2c18
+Revises: 4f8a2d6c1e93
+Create Date: 2026-10-17 02:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a5e3b9d2c18'
+down_revision: Union[str, None] = '4f8a2d6c1e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'scream_backfill',
+        sa.Column('guild_id', sa.BigInteger(), nullable=False),
+        sa.Column('channel_id', sa.BigInteger(), nullable=False),
+        sa.Column('last_message_id', sa.BigInteger(), nullable=False),
+        sa.Column('messages', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('guild_id'),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'scream_backfill_users',
+        sa.Column('guild_id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('streak', sa.Integer(), nullable=False),
+        sa.Column('streak_last', sa.Integer(), nullable=False),
+        sa.Column('best_streak', sa.Integer(), nullable=False),
+        sa.Column('last_day', sa.Date(), nullable=True),
+        sa.Column('daily', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('guild_id', 'user_id'),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('scream_backfill_users')
+    op.drop_table('scream_backfill')
@@ -0,0 +1,27 @@
+"""add scream backfill channels
+
+Revision ID: 8a1f6c3e2d57
+Revises: 2b8e5d1f4c96
+Create Date: 2026-10-17 07:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a1f6c3e2d57'
+down_revision: Union[str, None] = '2b8e5d1f4c96'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('scream_backfill', sa.Column('channel_ids', postgresql.ARRAY(sa.BigInteger()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('scream_backfill', 'channel_ids')
@@ -0,0 +1,33 @@
+"""add partial streak reset index
+
+Revision ID: 8e41f0c2d7a6
+Revises: 5d3c1a7e9b20
+Create Date: 2026-10-17 01:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e41f0c2d7a6'
+down_revision: Union[str, None] = '5d3c1a7e9b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_screams_daily_streaking',
+        'screams',
+        ['daily'],
+        unique=False,
+        postgresql_where=sa.text('streak > 0'),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_screams_daily_streaking', table_name='screams', if_exists=True)
@@ -0,0 +1,28 @@
+"""add reminder leases
+
+Revision ID: 9f4d2b7e6a31
+Revises: 5c8a3f1b7d24
+Create Date: 2026-10-17 05:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f4d2b7e6a31'
+down_revision: Union[str, None] = '5c8a3f1b7d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('reminders', sa.Column('claimed_by', sa.String(), nullable=True))
+    op.add_column('reminders', sa.Column('claimed_until', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('reminders', 'claimed_until')
+    op.drop_column('reminders', 'claimed_by')
@@ -0,0 +1,94 @@
+"""
+Compare the single statement leaderboard query against the previous three rank() queries.
+
+This needs a development database configured through the usual POSTGRES_* environment variables.
+The table is seeded with 1M users inside a transaction that is rolled back, so existing rows are left untouched.
+
+Run from the repository root:
+    python -m benchmarks.leaderboard
+"""
+import asyncio
+import time
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from bot.cogs.statistics import leaderboard_query
+from bot.database import engine
+from bot.database.models import Screams
+from bot.lib.leaderboard import Leaderboard
+
+USERS = 1_000_000
+# all of the users are in one guild, the largest a leaderboard can be
+GUILD = 1
+TOP = 5
+RUNS = 20
+
+SEED = text(
+    """
+    INSERT INTO screams (guild_id, user_id, total, streak, streak_last, best_streak, daily, streak_keeper)
+    SELECT :guild, id, total, streak, 0, streak + (random() * 100)::int, now() - random() * interval '30 days', to_timestamp(0)
+    FROM (
+        SELECT id, (random() ^ 4 * 50000)::int AS total, (random() ^ 8 * 400)::int AS streak
+        FROM generate_series(1, :users) AS id
+    ) AS users
+    """
+)
+
+
+async def three_queries(conn: AsyncConnection) -> int:
+    """
+    The previous leaderboard, one window function query over the whole table per column
+    """
+    count = 0
+    for col in (Screams.total, Screams.streak, Screams.best_streak):
+        subq = (
+            select(Screams.user_id, col.label("col"), func.rank().over(order_by=col.desc()).label("rank")).where(
+                Screams.guild_id == GUILD
+            )
+        ).subquery()
+        count += len((await conn.execute(select(subq).where(subq.c.rank <= TOP))).all())
+    return count
+
+
+async def single_query(conn: AsyncConnection) -> int:
+    return len((await conn.execute(leaderboard_query(GUILD, Leaderboard.columns, TOP, with_ties=True))).all())
+
+
+async def timed(conn: AsyncConnection, query) -> float:
+    await query(conn)  # warm up the cache
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        await query(conn)
+    return (time.perf_counter() - start) / RUNS
+
+
+async def main():
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            await conn.run_sync(Screams.__table__.create, checkfirst=True)
+            await conn.execute(text("DELETE FROM screams"))
+            await conn.execute(SEED, {"users": USERS, "guild": GUILD})
+            await conn.execute(text("ANALYZE screams"))
+            print(f"seeded {USERS} users")
+
+            for index in Screams.__table__.indexes:
+                await conn.run_sync(index.create, checkfirst=True)
+            baseline = await timed(conn, three_queries)
+            candidate = await timed(conn, single_query)
+            print(f"  indexed   | three queries {baseline * 1000:8.2f} ms | single query {candidate * 1000:8.2f} ms")
+            print(f"            | speedup {baseline / candidate:.1f}x")
+
+            for index in Screams.__table__.indexes:
+                await conn.run_sync(index.drop)
+            baseline = await timed(conn, three_queries)
+            candidate = await timed(conn, single_query)
+            print(f"  unindexed | three queries {baseline * 1000:8.2f} ms | single query {candidate * 1000:8.2f} ms")
+        finally:
+            await trans.rollback()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
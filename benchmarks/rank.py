@@ -0,0 +1,73 @@
+"""
+Compare the index-backed COUNT(*) rank lookup against ranking the whole guild with window functions.
+
+This needs a development database configured through the usual POSTGRES_* environment variables.
+The table is seeded with 1M users inside a transaction that is rolled back, so existing rows are left untouched.
+
+Run from the repository root:
+    python -m benchmarks.rank
+"""
+import asyncio
+import time
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from benchmarks.leaderboard import GUILD, SEED, USERS
+from bot.cogs.statistics import rank_query
+from bot.database import engine
+from bot.database.models import Screams
+from bot.lib.leaderboard import Leaderboard
+
+RUNS = 10
+
+
+async def window_rank(conn: AsyncConnection, uid: int):
+    """
+    Rank every user in the guild and pick out one, what a rank lookup costs without the count queries
+    """
+    ranks = [func.rank().over(order_by=getattr(Screams, col).desc()).label(col) for col in Leaderboard.columns]
+    subq = select(Screams.user_id, *ranks).where(Screams.guild_id == GUILD).subquery()
+    return (await conn.execute(select(subq).where(subq.c.user_id == uid))).one()
+
+
+async def count_rank(conn: AsyncConnection, uid: int):
+    return (await conn.execute(rank_query(GUILD, uid))).one()
+
+
+async def timed(conn: AsyncConnection, query, uid: int) -> float:
+    await query(conn, uid)  # warm up the cache
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        await query(conn, uid)
+    return (time.perf_counter() - start) / RUNS
+
+
+async def main():
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            await conn.run_sync(Screams.__table__.create, checkfirst=True)
+            await conn.execute(text("DELETE FROM screams"))
+            await conn.execute(SEED, {"users": USERS, "guild": GUILD})
+            await conn.execute(text("ANALYZE screams"))
+            print(f"seeded {USERS} users")
+
+            # the count queries read more of the index the further down the user is
+            by_total = select(Screams.user_id).where(Screams.guild_id == GUILD).order_by(Screams.total.desc())
+            for name, offset in (("top", 0), ("median", USERS // 2), ("bottom", USERS - 1)):
+                uid = await conn.scalar(by_total.offset(offset).limit(1))
+                assert tuple(await window_rank(conn, uid))[1:] == tuple(await count_rank(conn, uid))[1::2]
+                baseline = await timed(conn, window_rank, uid)
+                candidate = await timed(conn, count_rank, uid)
+                print(
+                    f"  {name:6} user | window functions {baseline * 1000:8.2f} ms | "
+                    f"count queries {candidate * 1000:8.2f} ms | speedup {baseline / candidate:.1f}x"
+                )
+        finally:
+            await trans.rollback()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
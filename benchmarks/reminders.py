@@ -0,0 +1,145 @@
+"""
+Compare one asyncio task per reminder against the reminders cog's single Scheduler with compact records.
+
+Memory is measured for 100k reminders spread over 30 days, held as sleeping tasks, as scheduled records, and as
+the records within the cog's one hour horizon. Lateness is measured by firing 100k reminders due within two
+seconds both ways.
+
+Run from the repository root:
+    python -m benchmarks.reminders
+"""
+import asyncio
+import logging
+import random
+import time
+import tracemalloc
+from datetime import timedelta
+
+from bot.cogs.reminder import reminder_horizon, reminders
+from bot.lib.date import now_tz
+from bot.lib.scheduler import Scheduler
+
+REMINDERS = 100_000
+SPREAD = timedelta(days=30)
+BURST = 2.0
+
+log = logging.getLogger("benchmark")
+
+
+class TaskReminder:
+    # what the cog kept for every reminder before, next to its task
+    def __init__(self, rid, aid, cid, message, requested_time, interval, delay):
+        self.started = False
+        self.stopped = False
+        self._task = None
+        self.rid = rid
+        self.aid = aid
+        self.cid = cid
+        self.message = message
+        self.requested_time = requested_time
+        self.interval = interval
+        self.delay = delay
+
+
+def offsets(count: int, spread: float, seed: int = 0) -> list[float]:
+    rng = random.Random(seed)
+    return [rng.random() * spread for _ in range(count)]
+
+
+async def measure(build) -> tuple[float, float]:
+    """
+    :return: (MiB allocated by build and still held, seconds taken)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    held = await build()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return size / 2**20, elapsed
+
+
+async def memory():
+    now = now_tz()
+    delays = offsets(REMINDERS, SPREAD.total_seconds())
+
+    async def tasks():
+        held = []
+        for rid, delay in enumerate(delays):
+            reminder = TaskReminder(rid, 1, 1, "take out the trash", now, 0, delay)
+            reminder._task = asyncio.create_task(asyncio.sleep(delay))
+            held.append(reminder)
+        await asyncio.sleep(0)
+        return held
+
+    def scheduled(horizon: float | None):
+        async def build():
+            scheduler = Scheduler("benchmark", log, None)
+            held = {}
+            for rid, delay in enumerate(delays):
+                if horizon is not None and delay > horizon:
+                    continue
+                held[rid] = reminders.ScheduledReminder(rid, 1, 1, "take out the trash", now)
+                scheduler.schedule(rid, now + timedelta(seconds=delay))
+            return scheduler, held
+
+        return build
+
+    task_mib, task_s = await measure(tasks)
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
+    await asyncio.sleep(0)
+    heap_mib, heap_s = await measure(scheduled(None))
+    horizon_mib, horizon_s = await measure(scheduled(reminder_horizon))
+    print(f"{REMINDERS} reminders over {SPREAD.days} days")
+    print(f"  task per reminder  {task_mib:8.2f} MiB {task_s * 1000:8.1f} ms to start")
+    print(f"  scheduler          {heap_mib:8.2f} MiB {heap_s * 1000:8.1f} ms to schedule")
+    print(f"  scheduler, horizon {horizon_mib:8.2f} MiB {horizon_s * 1000:8.1f} ms to schedule")
+
+
+async def lateness():
+    delays = offsets(REMINDERS, BURST, seed=1)
+
+    late = []
+
+    async def task_reminder(due):
+        await asyncio.sleep((due - now_tz()).total_seconds())
+        late.append((now_tz() - due).total_seconds())
+
+    start = now_tz() + timedelta(seconds=1)
+    await asyncio.gather(*(task_reminder(start + timedelta(seconds=delay)) for delay in delays))
+    task_late = sorted(late)
+
+    late = []
+    due_times = {}
+
+    async def fire(rids):
+        now = now_tz()
+        late.extend((now - due_times.pop(rid)).total_seconds() for rid in rids)
+
+    scheduler = Scheduler("benchmark", log, fire)
+    start = now_tz() + timedelta(seconds=1)
+    for rid, delay in enumerate(delays):
+        due_times[rid] = start + timedelta(seconds=delay)
+        scheduler.schedule(rid, due_times[rid])
+    scheduler.start()
+    while due_times:
+        await asyncio.sleep(0.1)
+    await scheduler.stop()
+    heap_late = sorted(late)
+
+    print(f"{REMINDERS} reminders due within {BURST:.0f}s, lateness")
+    for name, values in (("task per reminder", task_late), ("scheduler", heap_late)):
+        p50, p99 = values[len(values) // 2], values[int(len(values) * 0.99)]
+        print(f"  {name:17} p50 {p50 * 1000:8.1f} ms | p99 {p99 * 1000:8.1f} ms | max {values[-1] * 1000:8.1f} ms")
+
+
+async def main():
+    await memory()
+    await lateness()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
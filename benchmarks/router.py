@@ -0,0 +1,138 @@
+"""
+Compare dispatching messages through the MessageRouter against every cog listening to every message.
+
+The broadcast listeners do what the statistics listener used to: discord.py starts a task per listener for
+every message, which looks up the guild config and compares the channel. The router starts one task for the
+bot's on_message, which starts another only for messages routed to a handler, and only runs the handlers
+registered for the message's channel.
+
+Run from the repository root:
+    python -m benchmarks.router
+"""
+import asyncio
+import logging
+import random
+import time
+from types import SimpleNamespace
+
+from bot.lib.registry import ConfigRegistry
+from bot.lib.router import MessageRouter
+
+GUILDS = 1000
+CHANNELS_PER_GUILD = 50
+MESSAGES = 200_000
+BATCH = 1000
+
+
+class Channel(SimpleNamespace):
+    # channels compare by id like discord.abc.GuildChannel
+    def __eq__(self, other):
+        return isinstance(other, Channel) and other.id == self.id
+
+    __hash__ = None
+
+
+def build(cogs: int, seed: int = 0):
+    """
+    Build guilds with a routed channel per cog and messages spread across all their channels
+    """
+    rng = random.Random(seed)
+    guilds = [SimpleNamespace(id=g) for g in range(GUILDS)]
+    channels = [
+        Channel(id=g * CHANNELS_PER_GUILD + c, guild=guilds[g])
+        for g in range(GUILDS)
+        for c in range(CHANNELS_PER_GUILD)
+    ]
+    # each cog watches the first channels of every guild, cog i the i-th one
+    configs = [
+        {g.id: SimpleNamespace(channel=channels[g.id * CHANNELS_PER_GUILD + i]) for g in guilds} for i in range(cogs)
+    ]
+    author = SimpleNamespace(bot=False)
+    messages = []
+    for _ in range(MESSAGES):
+        channel = rng.choice(channels)
+        messages.append(SimpleNamespace(channel=channel, guild=channel.guild, author=author, content="AAAAAAAAAA"))
+    return configs, messages
+
+
+async def registry(configs: dict) -> ConfigRegistry:
+    async def load(guild_id):
+        return configs[guild_id]
+
+    reg = ConfigRegistry(load, maxsize=len(configs))
+    for guild_id in configs:
+        await reg.get(guild_id)
+    return reg
+
+
+async def broadcast(configs: list[dict], messages: list) -> tuple[float, int]:
+    handled = 0
+
+    def listener(reg: ConfigRegistry):
+        async def on_message(message):
+            nonlocal handled
+            if message.author.bot:
+                return
+            config = await reg.get(message.guild.id)
+            if message.channel == config.channel:
+                handled += 1
+
+        return on_message
+
+    async def bot_on_message(message):
+        # the bot's own on_message, which runs the commands, is scheduled with or without the router
+        pass
+
+    listeners = [bot_on_message] + [listener(await registry(c)) for c in configs]
+    start = time.perf_counter()
+    for i in range(0, len(messages), BATCH):
+        # Client.dispatch schedules every listener as its own task
+        await asyncio.gather(*(asyncio.create_task(on(m)) for m in messages[i : i + BATCH] for on in listeners))
+    return time.perf_counter() - start, handled
+
+
+async def routed(configs: list[dict], messages: list) -> tuple[float, int]:
+    handled = 0
+    router = MessageRouter(logging.getLogger("benchmark"))
+
+    def handler(reg: ConfigRegistry):
+        async def on_scream(message):
+            nonlocal handled
+            if message.author.bot:
+                return
+            await reg.get(message.guild.id)
+            handled += 1
+
+        return on_scream
+
+    for c in configs:
+        on_scream = handler(await registry(c))
+        for config in c.values():
+            router.add_channel(config.channel.id, on_scream)
+
+    async def bot_on_message(message):
+        # the bot's on_message schedules the routed handlers and then runs the commands
+        router.schedule(message)
+
+    start = time.perf_counter()
+    for i in range(0, len(messages), BATCH):
+        await asyncio.gather(*(asyncio.create_task(bot_on_message(m)) for m in messages[i : i + BATCH]))
+        await asyncio.gather(*router.tasks)
+    return time.perf_counter() - start, handled
+
+
+async def main():
+    print(f"{GUILDS} guilds, {CHANNELS_PER_GUILD} channels each, {MESSAGES} messages")
+    for cogs in (1, 2, 4):
+        configs, messages = build(cogs)
+        baseline, expected = await broadcast(configs, messages)
+        candidate, handled = await routed(configs, messages)
+        assert handled == expected
+        print(
+            f"  {cogs} cogs: broadcast {len(messages) / baseline:10,.0f} events/s | "
+            f"router {len(messages) / candidate:10,.0f} events/s | speedup {baseline / candidate:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""
+Compare the combined ScreamMatcher against running the primary and secondary regex separately.
+
+The matcher is first checked against plain re.search for patterns whose prefilters have gone wrong before.
+
+Run from the repository root:
+    python -m benchmarks.scream_matcher
+"""
+import random
+import re
+import timeit
+from types import SimpleNamespace
+
+from bot.lib.matcher import MAX_SCAN_LENGTH, ScreamMatcher
+
+PRIMARY = re.compile(r"[aA][arRgGAhH]{5,}")
+SECONDARY = re.compile(r":scream1:")
+# an admin supplied pattern without a leading literal, which the regex engine can't skip ahead for
+EXPENSIVE_PRIMARY = re.compile(r"(?:\w+\s+)*AAAA+H*")
+
+CHATTER = [
+    "has anyone started the assignment yet",
+    "lol",
+    "what time is the lecture tomorrow?",
+    "i think the tutor said it was due friday",
+    "https://discord.com/channels/809997432011882516/809997432011882519",
+    "ok",
+    "that exam was brutal",
+    "does anyone have notes from week 3",
+    "<:pepehands:1043839508887634010>",
+    "brb",
+    "i'm going to sleep for a week after this",
+    "can someone explain pointers to me like i'm five",
+]
+SCREAMS = [
+    "AAAAAAAAAAAAAAAAAAAAAAA",
+    "aaaaaaaaaaaaaaaarghhhhhh",
+    "AAAAAAAHHHHHHHHHHHHHHHH",
+    ":scream1:",
+    ":scream1: :scream1: :scream1:",
+    "AAAAAAAAAAAAAAAA :scream1:",
+    "why is this happening AAAAAAAAAAARGH",
+]
+
+
+# (pattern, text) pairs the prefilter must agree with re.search on
+PREFILTER_CASES = [
+    # a fixed repeat longer than MAX_PREFILTER_RUN is cut, the literal after it isn't next to the cut run
+    (r"xA{20}B", "x" + "A" * 20 + "B"),
+    (r"xA{20}B", "x" + "A" * 19 + "B"),
+    (r"xA{16}B", "x" + "A" * 16 + "B"),
+    (r"xA{3,}B", "xAAAAAAB"),
+    (r"(?:\w+\s+)*AAAA+H*", "why AAAAH"),
+    (r"(?:\w+\s+)*AAAA+H*", "why AAAH"),
+]
+
+
+def check():
+    for pattern, text in PREFILTER_CASES:
+        compiled = re.compile(pattern)
+        expected = compiled.search(text) is not None
+        assert ScreamMatcher(compiled, SECONDARY).match(text)[0] == expected, (pattern, text)
+
+
+def corpus(size: int = 10_000, scream_ratio: float = 0.3, seed: int = 0) -> list[str]:
+    """
+    Build a corpus of messages similar to a void channel, mostly chatter with some screams.
+    """
+    rng = random.Random(seed)
+    return [rng.choice(SCREAMS) if rng.random() < scream_ratio else rng.choice(CHATTER) for _ in range(size)]
+
+
+def two_search(messages: list[str], config: SimpleNamespace) -> int:
+    # as the statistics cog did, searching the config's patterns
+    count = 0
+    for msg in messages:
+        match_primary = config.regexp_primary.search(msg)
+        match_secondary = config.regexp_secondary.search(msg)
+        if match_primary or match_secondary:
+            count += 1
+    return count
+
+
+def combined(messages: list[str], matcher: ScreamMatcher) -> int:
+    # as the statistics cog does, searching directly when there is nothing to prefilter
+    count = 0
+    for msg in messages:
+        if matcher.prefiltered:
+            match_primary, match_secondary = matcher.match(msg)
+        else:
+            match_primary = matcher.primary.search(msg, 0, MAX_SCAN_LENGTH)
+            match_secondary = matcher.secondary.search(msg, 0, MAX_SCAN_LENGTH)
+        if match_primary or match_secondary:
+            count += 1
+    return count
+
+
+def main():
+    check()
+    for name, primary in (("default", PRIMARY), ("expensive", EXPENSIVE_PRIMARY)):
+        matcher = ScreamMatcher(primary, SECONDARY)
+        config = SimpleNamespace(regexp_primary=primary, regexp_secondary=SECONDARY)
+        print(f"{name} patterns | prefilters: {matcher.primary_prefilter} {matcher.secondary_prefilter}")
+        for ratio in (0.05, 0.3, 0.9):
+            messages = corpus(scream_ratio=ratio)
+            assert two_search(messages, config) == combined(messages, matcher)
+            runs = 20
+            baseline = min(timeit.repeat(lambda: two_search(messages, config), number=runs, repeat=5))
+            candidate = min(timeit.repeat(lambda: combined(messages, matcher), number=runs, repeat=5))
+            per_msg = 1e9 / len(messages) / runs
+            print(
+                f"  scream ratio {ratio:.2f}: two searches {baseline * per_msg:7.1f} ns/msg | "
+                f"matcher {candidate * per_msg:7.1f} ns/msg | speedup {baseline / candidate:.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import os
 import traceback
 from datetime import datetime, timezone
 from logging.handlers import RotatingFileHandler
+from typing import Awaitable, Callable
 
 import discord
 from discord import app_commands
@@ -10,6 +11,8 @@ from discord.ext import commands, tasks
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .database import Session, dbconfig, engine
+from .lib.names import NameResolver
+from .lib.router import MessageRouter
 import aiohttp
 
 
@@ -24,11 +27,18 @@ class Bot(commands.Bot):
         super().__init__(*args, **kwargs)
 
         self.uptime = datetime.now(timezone.utc)
+        # coroutines run on close before the database is disposed, e.g. to flush buffered writes
+        self.shutdown_hooks: list[Callable[[], Awaitable[None]]] = []
+        # cached user id -> display name lookups shared by the cogs
+        self.names = NameResolver(self)
 
         self.load_enviroment()
         self.configure_logging()
         self.init_database()
 
+        # routes messages to the cogs registered for their channel, see MessageRouter
+        self.router = MessageRouter(self.log)
+
     def load_enviroment(self) -> None:
         """
         Load defaults or settings enviroment variables
@@ -185,6 +195,12 @@ class Bot(commands.Bot):
         """
         Closes the connection to Discord and the database.
         """
+        for hook in list(self.shutdown_hooks):
+            try:
+                await hook()
+            except Exception as e:
+                self.log.error(f"Shutdown hook {hook.__qualname__} failed: {e}")
+
         if self.db is not None:
             await self.db.dispose()
             self.log.info(msg="Database connection closed")
@@ -199,6 +215,16 @@ class Bot(commands.Bot):
         """Initialize the setup data."""
         pass
 
+    async def on_message(self, message: discord.Message) -> None:
+        """
+        Route the message to the cogs handling its channel and run any commands in it
+
+        :param message: the message
+        """
+        # the handlers run in their own task so a slow one, e.g. loading a config, doesn't delay the commands
+        self.router.schedule(message)
+        await self.process_commands(message)
+
     async def on_command(self, ctx: commands.Context):
         """
         Log commands that are run
@@ -11,6 +11,8 @@ from sqlalchemy import Sequence, delete, select
 
 from bot.database.models import CourseChannel, CourseConfig, CourseEnrollment, Course
 from bot.lib.date import now_tz
+from bot.lib.hydrate import get_guild
+from bot.lib.registry import ConfigRegistry
 
 cog_name = "course"
 
@@ -35,7 +37,7 @@ class course(commands.Cog):
                 raise ValueError("Could not find a row in the database for this guild.")
             obj = cls()
             try:
-                guild: discord.Guild | None = await bot.fetch_guild(row.guild_id)
+                guild: discord.Guild | None = await get_guild(bot, row.guild_id)
                 if guild is None:
                     return obj
                 obj.auto_delete = row.auto_delete
@@ -71,9 +73,9 @@ class course(commands.Cog):
         self.log.info(f"Loaded {self.__class__.__name__}")
         self.verify_log = {}
 
-        bot.modules[cog_name] = {}
-        for guild in bot.guilds:
-            bot.modules[cog_name][guild.id] = self.Config()
+        # guild id -> Config, loaded on first use
+        self.configs: ConfigRegistry[course.Config] = ConfigRegistry(self.load_config)
+        bot.modules[cog_name] = self.configs
 
     async def _init(self):
         """
@@ -93,18 +95,29 @@ class course(commands.Cog):
             await conn.run_sync(CourseConfig.__table__.create, checkfirst=True)
             await conn.run_sync(Course.__table__.create, checkfirst=True)
 
-        for guild in self.bot.guilds:
-            await self.enroll(guild.id)
+    async def load_config(self, guild_id: int) -> "course.Config":
+        """
+        Load the config of a guild from the database, see ConfigRegistry
 
-    async def enroll(self, guild_id):
+        :param guild_id: the guild id
+        :return: the config, the defaults if the guild has not been set up
+        """
         async with self.bot.session as session:
             self.log.info(f"{cog_name} - Enrolling guild {guild_id}")
             row = await session.get(CourseConfig, guild_id)
             if row is None:
-                return
-            all_codes = (await session.scalars(select(Course))).all()
-            codes = [code.course_code for code in all_codes]
-            self.bot.modules[cog_name][guild_id] = await self.Config.from_row(self.bot, row, codes)
+                return self.Config()
+            codes = (await session.scalars(select(Course.course_code).where(Course.guild_id == guild_id))).all()
+        return await self.Config.from_row(self.bot, row, list(codes))
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        # drop a config left from an earlier stay, it is loaded when it is first used
+        self.configs.pop(guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.configs.pop(guild.id)
 
     def format_channel_name(self, name: str, is_category=False) -> str:
         """
@@ -222,7 +235,7 @@ class course(commands.Cog):
             names = [ch.name for ch in channels]
             return sorted(names + [channel_name]).index(channel_name)
 
-        config = self.bot.modules[cog_name].get(guild.id)
+        config = await self.configs.get(guild.id)
         
         channel_name = self.format_channel_name(channel_name, is_category)
         if is_category:
@@ -322,7 +335,7 @@ class course(commands.Cog):
             description=f"Members: {len(members)}",
         )
 
-    def get_course_channels(self, guild: discord.Guild) -> list[discord.TextChannel]:
+    async def get_course_channels(self, guild: discord.Guild) -> list[discord.TextChannel]:
         """
         Get a list of all course channels in the guild.
 
@@ -330,7 +343,7 @@ class course(commands.Cog):
         :return: the course channels
         """
         res = []
-        config = self.bot.modules[cog_name].get(guild.id)
+        config = await self.configs.get(guild.id)
         
         for channel in guild.text_channels:
             if channel.category is not None and channel.category.name in config.course_codes:
@@ -375,7 +388,7 @@ class course(commands.Cog):
             )
             return
         descriptor, _ = self.parse_course_code(code)
-        config = self.bot.modules[cog_name].get(guild.id)
+        config = await self.configs.get(guild.id)
         if descriptor not in config.course_codes:
             await interaction.followup.send(
                 f"Cannot enroll in that course type in this server: {descriptor}. Must be one of {', '.join(config.course_codes)}.",
@@ -437,7 +450,7 @@ class course(commands.Cog):
             return
         await channel.set_permissions(user, overwrite=None)
         # check if we need to auto delete the channel
-        config = self.bot.modules[cog_name].get(guild.id)
+        config = await self.configs.get(guild.id)
         if config is not None and config.auto_delete:
             members = [member for member in channel.members if member.bot is False]
             if config.auto_delete_ignore_admins is True:
@@ -608,8 +621,8 @@ class course(commands.Cog):
                         )
                         session.add(enrollment)
             # add new channels
-            channels = self.get_course_channels(guild)
-            config = self.bot.modules[cog_name].get(guild.id)
+            channels = await self.get_course_channels(guild)
+            config = await self.configs.get(guild.id)
             channels += [channel for channel in guild.categories if channel.name in config.course_codes]
             for channel in channels:
                 if channel.id not in db_channel_ids:
@@ -645,7 +658,7 @@ class course(commands.Cog):
         await interaction.response.defer(ephemeral=True)
         guild = interaction.guild
         async with self.bot.session as session:
-            for channel in self.get_course_channels(guild):
+            for channel in await self.get_course_channels(guild):
                 stmt = (
                     select(CourseEnrollment)
                     .where(CourseEnrollment.channel_id == channel.id)
@@ -666,7 +679,7 @@ class course(commands.Cog):
     async def delete_courses(self, interaction: discord.Interaction, channel: discord.abc.GuildChannel) -> None:
         await interaction.response.defer(ephemeral=True)
         descriptor, _ = self.parse_course_code(channel.name, allow_category=True)
-        config = self.bot.modules[cog_name].get(interaction.guild.id)
+        config = await self.configs.get(interaction.guild.id)
         if descriptor not in config.course_codes:
             await interaction.followup.send(f"Cannot use this command to delete non-course channels.", ephemeral=True)
             return
@@ -1,92 +1,126 @@
-import asyncio
 import re
-from contextlib import suppress
 from datetime import datetime, timedelta
 
 import discord
 from discord import app_commands
 from discord.ext import commands
-from sqlalchemy import Sequence, select
+from sqlalchemy import DateTime, Sequence, any_, delete, func, literal, select, tuple_, update
 
 from bot.database.models import Reminder
 from bot.lib.date import now_tz, _time
+from bot.lib.lease import claim
+from bot.lib.scheduler import Scheduler
 
 mention_only_user = discord.AllowedMentions(everyone=False, users=False, roles=False)
 
 cog_name = "reminder"
 
+# only reminders due within this many seconds are kept in memory, later ones are paged in as time advances
+reminder_horizon = 60 * 60
+# how often the next reminders are paged in, less than the horizon so none are paged in late
+reminder_page_interval = reminder_horizon / 2
+# rows read per query when paging in reminders
+reminder_page_size = 1000
+# seconds a due reminder is leased to the worker sending it, other workers claim it once it runs out
+reminder_lease = 300
+# seconds before a one off reminder that failed to send is tried again
+reminder_retry_delay = 60
+# seconds before a reminder that another worker was claiming at the same time is checked again
+reminder_claim_retry = 1
+# reminders listed by the show commands, the rest are left out
+reminder_list_limit = 50
+
+
+def next_send_time(requested_time: datetime, interval: int, now: datetime) -> datetime:
+    """
+    Get the next time a repeating reminder is sent after now
+
+    :param requested_time: when the reminder was requested
+    :param interval: seconds between reminders
+    :param now: the current time
+    :return: the next send time
+    """
+    periods = int((now - requested_time).total_seconds() // interval) + 1
+    return requested_time + timedelta(seconds=interval * periods)
+
+
+def due_query(end: datetime, after: tuple[datetime, int] | None = None, limit: int = reminder_page_size):
+    """
+    Build a statement for a page of the one off reminders sent before `end`, read in (send_time, id) order
+    from the partial index on them
+
+    :param end: the end of the window
+    :param after: the (send_time, id) of the last reminder of the previous page
+    :param limit: the page size
+    :return: a statement selecting the Reminder rows
+    """
+    stmt = (
+        select(Reminder)
+        .where(Reminder.repeat == False, Reminder.send_time <= end)
+        .order_by(Reminder.send_time, Reminder.id)
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(Reminder.send_time, Reminder.id) > after)
+    return stmt
+
+
+def repeating_query(now: datetime, end: datetime, after: int | None = None, limit: int = reminder_page_size):
+    """
+    Build a statement for a page of the repeating reminders next sent before `end`, read in id order
+
+    The first send time of a repeating reminder is stored as its send time, so its next send time is
+    computed from the interval between its requested and first send time.
+
+    :param now: the current time
+    :param end: the end of the window
+    :param after: the id of the last reminder of the previous page
+    :param limit: the page size
+    :return: a statement selecting the Reminder rows
+    """
+    interval = Reminder.send_time - Reminder.requested_time
+    elapsed = func.extract("epoch", literal(now, DateTime(timezone=True)) - Reminder.requested_time)
+    periods = func.floor(elapsed / func.nullif(func.extract("epoch", interval), 0)) + 1
+    next_send = Reminder.requested_time + interval * periods
+    stmt = select(Reminder).where(Reminder.repeat == True, next_send <= end).order_by(Reminder.id).limit(limit)
+    if after is not None:
+        stmt = stmt.where(Reminder.id > after)
+    return stmt
+
 
 class reminders(commands.GroupCog, name="reminders"):
-    class RepeatingReminder:
+    class ScheduledReminder:
+        """
+        A reminder due within the horizon, kept compact since there can be many
+        """
+
+        __slots__ = ("rid", "aid", "cid", "message", "requested_time", "interval", "backup")
+
         def __init__(
             self,
-            bot: commands.Bot,
+            rid: int,
             aid: int,
             cid: int,
             message: str,
-            interval: int,
             requested_time: datetime,
-            delay: int = 0,
+            interval: int = 0,
+            backup: bool = False,
         ) -> None:
-            self.bot = bot
-            self.started = False
-            self.stopped = False
-            self._task = None
-
+            self.rid = rid
             self.aid = aid
             self.cid = cid
             self.message = message
-            self.interval = interval
             self.requested_time = requested_time
-            self.delay = delay
-
-        async def start(self):
-            if self.stopped:
-                return
-            if not self.started:
-                self.started = True
-                self._task = asyncio.ensure_future(self._run())
-
-        async def stop(self):
-            self.stopped = True
-            if self.started:
-                self.started = False
-                # Stop task and await it stopped:
-                if self._task is not None:
-                    was_cancelled = self._task.cancel()
-                    if not was_cancelled:
-                        self.bot.log.error("Failed to cancel task")
-                    with suppress(asyncio.CancelledError):
-                        self.bot.log.error("Failed to cancel task")
-                        await self._task
-
-        async def _run(self):
-            while True:
-                if self.delay:
-                    await asyncio.sleep(self.delay)
-                    await self.send_message()
-                    self.delay = 0
-
-                await asyncio.sleep(self.interval)
-                await self.send_message()
-
-        async def send_message(self):
-            try:
-                channel = await self.bot.fetch_channel(self.cid)
-            except discord.errors.NotFound:
-                self.bot.log.error(f"Channel {self.cid} not found")
-                return
-
-            now = round(datetime.timestamp(now_tz()))
-            then = round(datetime.timestamp(self.requested_time))
-            embed = discord.Embed(
-                title="Scheduled Reminder",
-                description=f"<@{self.aid}>'s repeating reminder\nSent <t:{now}:T> <t:{now}:d>\nReqested: <t:{then}:T> <t:{then}:d>",
-            )
-            embed.add_field(name="Message", value=f"{self.message}")
-            embed.set_footer(text=f"Repeats every: {_time.seconds_to_string(self.interval)}")
+            # seconds between repeats, 0 for one off reminders
+            self.interval = interval
+            # loaded from the database after a restart
+            self.backup = backup
 
-            await channel.send(embed=embed, allowed_mentions=mention_only_user)
+        @classmethod
+        def from_row(cls, row: Reminder, backup: bool = False):
+            rid, aid, cid, message, send_time, requested_time, repeat = row
+            interval = int((send_time - requested_time).total_seconds()) if repeat else 0
+            return cls(rid, aid, cid, message, requested_time, interval, backup)
 
     create_group = app_commands.Group(name="create", description="create a reminder")
 
@@ -94,8 +128,12 @@ class reminders(commands.GroupCog, name="reminders"):
         super().__init__()
         self.bot = bot
         self.log = bot.log
-        self.repeating: dict[int, self.RepeatingReminder] = {}
-        self.tasks = []
+        # reminder id -> reminder, only those due before `horizon_end`
+        self.scheduled: dict[int, reminders.ScheduledReminder] = {}
+        self.horizon_end = now_tz()
+        self.scheduler: Scheduler[int] = Scheduler(
+            cog_name, self.log, self.send_due, reconcile=self.page_in, reconcile_interval=reminder_page_interval
+        )
 
     async def _init(self):
         """
@@ -113,58 +151,185 @@ class reminders(commands.GroupCog, name="reminders"):
         async with self.bot.db.begin() as conn:
             await conn.run_sync(Reminder.__table__.create, checkfirst=True)
 
+        await self.page_in(backup=True)
+        self.scheduler.start()
+
+    async def _destroy(self):
+        await self.scheduler.stop()
+
+    async def page_in(self, backup: bool = False):
+        """
+        Schedule the reminders due before the end of the next horizon window that aren't scheduled yet,
+        run periodically by the scheduler
+
+        :param backup: the reminders are loaded after a restart
+        """
+        now = now_tz()
+        end = now + timedelta(seconds=reminder_horizon)
+        self.horizon_end = end
+        added = 0
         async with self.bot.session as session:
-            reminders: Sequence[Reminder] = (await session.scalars(select(Reminder))).all()
+            after = None
+            while True:
+                rows: Sequence[Reminder] = (await session.scalars(due_query(end, after))).all()
+                for row in rows:
+                    if row.id not in self.scheduled:
+                        self.track(self.ScheduledReminder.from_row(row, backup), row.send_time, now)
+                        added += 1
+                if len(rows) < reminder_page_size:
+                    break
+                after = (rows[-1].send_time, rows[-1].id)
+            after = None
+            while True:
+                rows = (await session.scalars(repeating_query(now, end, after))).all()
+                for row in rows:
+                    if row.id not in self.scheduled:
+                        self.track(self.ScheduledReminder.from_row(row, backup), None, now)
+                        added += 1
+                if len(rows) < reminder_page_size:
+                    break
+                after = rows[-1].id
+        self.log.debug(f"Paged in {added} reminders, {len(self.scheduled)} scheduled until {end}")
+
+    def track(self, reminder: "reminders.ScheduledReminder", send_time: datetime | None, now: datetime):
+        """
+        Schedule a reminder if it is due within the horizon, it is paged in later otherwise
 
-            for reminder in reminders:
-                rid, aid, cid, msg, send_time, requested_time, repeat = reminder
+        :param reminder: the reminder
+        :param send_time: the send time, the next repeat after now if None
+        :param now: the current time
+        """
+        if send_time is None:
+            send_time = next_send_time(reminder.requested_time, reminder.interval, now)
+        if send_time > self.horizon_end:
+            self.scheduled.pop(reminder.rid, None)
+            return
+        self.scheduled[reminder.rid] = reminder
+        self.scheduler.schedule(reminder.rid, send_time)
 
-                now = now_tz()
-                if bool(repeat):
-                    interval = int((send_time - requested_time).total_seconds())
-                    delta = int((now - requested_time).total_seconds())
-                    self.repeating[rid] = self.RepeatingReminder(
-                        self.bot, aid, cid, msg, interval, requested_time, interval - (delta % interval)
+    async def send_due(self, rids: list[int]):
+        """
+        Send the reminders that are due, called by the scheduler
+
+        Each due reminder is claimed first so it is sent by one worker when several share the table. A sent
+        repeating reminder stays leased until its next send time, so its occurrence isn't sent again by a worker
+        that scheduled it later. Reminders claimed by another worker are checked again when their lease runs out,
+        which sends them if that worker crashed.
+
+        :param rids: the reminder ids
+        """
+        now = now_tz()
+        rids = [rid for rid in rids if rid in self.scheduled]
+        if not rids:
+            return
+        try:
+            async with self.bot.session as session, session.begin():
+                stmt = claim(Reminder, Reminder.id == any_(rids), now=now, lease=reminder_lease)
+                claimed = {row.id for row in (await session.scalars(stmt)).all()}
+                leased = {}
+                if len(claimed) < len(rids):
+                    stmt = select(Reminder.id, Reminder.claimed_until).where(
+                        Reminder.id == any_([rid for rid in rids if rid not in claimed])
                     )
-                    await self.repeating[rid].start()
+                    leased = dict((await session.execute(stmt)).all())
+        except Exception as e:
+            # the scheduler already dropped them, schedule them again or page_in would skip them as scheduled
+            self.log.error(f"Failed to claim reminders {rids}: {e}")
+            retry_at = now + timedelta(seconds=reminder_claim_retry)
+            for rid in rids:
+                self.scheduler.schedule(rid, retry_at)
+            return
+
+        sent_once = []
+        retries = []
+        retry_at = now + timedelta(seconds=reminder_retry_delay)
+        next_times = {}
+        for rid in rids:
+            reminder = self.scheduled.get(rid)
+            if reminder is None:
+                continue
+            if rid not in claimed:
+                if rid not in leased:
+                    # deleted, e.g. sent by another worker
+                    self.scheduled.pop(rid)
+                    continue
+                until = leased[rid]
+                if until is None or until <= now:
+                    # another worker is claiming it right now
+                    until = now + timedelta(seconds=reminder_claim_retry)
+                if until > self.horizon_end:
+                    self.scheduled.pop(rid)
                 else:
-                    # remove reminders that should have already happened
-                    if send_time < now:
-                        await self.remove_reminder(aid, rid)
-                    else:  # Set up missing reminder
-                        delay = int((send_time - now).total_seconds())
-                        self.tasks.append(
-                            asyncio.create_task(
-                                self.start_reminder(rid, aid, cid, requested_time, msg, delay=delay, backup=True)
-                            )
-                        )
+                    self.scheduler.schedule(rid, until)
+                continue
+            try:
+                if reminder.interval:
+                    await self.send_repeating(reminder)
+                else:
+                    await self.send_reminder(reminder)
+            except discord.errors.NotFound:
+                self.log.warning(f"Channel {reminder.cid} not found for reminder {rid}")
+            except Exception as e:
+                self.log.error(f"Failed to send reminder {rid}: {e}")
+                if not reminder.interval:
+                    # keep it and try again later, it stays leased to this worker until then
+                    retries.append(rid)
+                    self.scheduler.schedule(rid, retry_at)
+                    continue
+            if reminder.interval:
+                next_times[rid] = next_send_time(reminder.requested_time, reminder.interval, now)
+                self.track(reminder, next_times[rid], now)
+            else:
+                sent_once.append(rid)
+                self.scheduled.pop(rid, None)
+
+        # finish the claims, sent one off reminders are removed and repeating ones stay leased until their next send
+        if sent_once or retries or next_times:
+            async with self.bot.session as session, session.begin():
+                if sent_once:
+                    await session.execute(delete(Reminder).where(Reminder.id == any_(sent_once)))
+                if retries:
+                    await session.execute(
+                        update(Reminder)
+                        .where(Reminder.id == any_(retries))
+                        .values(claimed_until=retry_at)
+                        .execution_options(synchronize_session=False)
+                    )
+                for rid, send_time in next_times.items():
+                    await session.execute(
+                        update(Reminder)
+                        .where(Reminder.id == rid)
+                        .values(claimed_until=send_time)
+                        .execution_options(synchronize_session=False)
+                    )
 
-    async def _destroy(self):
-        for _, reminder in self.repeating.items():
-            await reminder.stop()
-        for task in self.tasks:
-            task.cancel()
-
-    async def start_reminder(
-        self,
-        rid: int,
-        aid: int,
-        cid: int,
-        requested_time: datetime,
-        message: str,
-        delay: int = 0,
-        backup: bool = False,
-    ):
-        await asyncio.sleep(delay)
-        channel = await self.bot.fetch_channel(cid)
+    async def send_reminder(self, reminder: "reminders.ScheduledReminder"):
+        channel = await self.bot.fetch_channel(reminder.cid)
 
-        then = round(datetime.timestamp(requested_time))
-        msg = f"<@{aid}>, this is your reminder"
-        msg += "(loaded from backup)" if backup else ""
+        then = round(datetime.timestamp(reminder.requested_time))
+        msg = f"<@{reminder.aid}>, this is your reminder"
+        msg += "(loaded from backup)" if reminder.backup else ""
         msg += f"\nReqested <t:{then}:T> <t:{then}:d>"
-        msg += f"\nYou wanted to say: {message}"
+        msg += f"\nYou wanted to say: {reminder.message}"
         await channel.send(msg, allowed_mentions=mention_only_user)
-        await self.remove_reminder(aid, rid)
+
+    async def send_repeating(self, reminder: "reminders.ScheduledReminder"):
+        try:
+            channel = await self.bot.fetch_channel(reminder.cid)
+        except discord.errors.NotFound:
+            self.log.error(f"Channel {reminder.cid} not found")
+            return
+
+        now = round(datetime.timestamp(now_tz()))
+        then = round(datetime.timestamp(reminder.requested_time))
+        embed = discord.Embed(
+            title="Scheduled Reminder",
+            description=f"<@{reminder.aid}>'s repeating reminder\nSent <t:{now}:T> <t:{now}:d>\nReqested: <t:{then}:T> <t:{then}:d>",
+        )
+        embed.add_field(name="Message", value=f"{reminder.message}")
+        embed.set_footer(text=f"Repeats every: {_time.seconds_to_string(reminder.interval)}")
+
+        await channel.send(embed=embed, allowed_mentions=mention_only_user)
 
     # region Reminder Control
 
@@ -190,9 +355,8 @@ class reminders(commands.GroupCog, name="reminders"):
             if reminder is not None:
                 await session.delete(reminder)
                 await session.commit()
-        if rid in self.repeating:
-            await self.repeating[rid].stop()
-            del self.repeating[rid]
+        if self.scheduled.pop(rid, None) is not None:
+            self.scheduler.cancel(rid)
 
     async def _reminder(self, ctx: commands.Context | discord.Interaction, delta_s: int, message: str, repeat=False):
         """
@@ -221,11 +385,8 @@ class reminders(commands.GroupCog, name="reminders"):
         cid = ctx.channel.id if isinstance(ctx, commands.Context) else ctx.channel_id
         aid = author.id
         rid = await self.add_reminder(aid, cid, message, remind_time, now, repeat)
-        if not repeat:
-            self.tasks.append(asyncio.create_task(self.start_reminder(rid, aid, cid, now, message)))
-        else:
-            self.repeating[rid] = self.RepeatingReminder(self.bot, aid, cid, message, delta_s, now)
-            await self.repeating[rid].start()
+        reminder = self.ScheduledReminder(rid, aid, cid, message, now, delta_s if repeat else 0)
+        self.track(reminder, remind_time, now)
 
     # endregion
     # region Commands
@@ -301,7 +462,12 @@ class reminders(commands.GroupCog, name="reminders"):
     async def show_reminders(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         async with self.bot.session as session:
-            stmt = select(Reminder).where(Reminder.user_id == interaction.user.id)
+            stmt = (
+                select(Reminder)
+                .where(Reminder.user_id == interaction.user.id)
+                .order_by(Reminder.send_time, Reminder.id)
+                .limit(reminder_list_limit)
+            )
             reminders: Sequence[Reminder] = (await session.scalars(stmt)).all()
 
             embed = discord.Embed(title="Reminders", description=f"{interaction.user.display_name}'s reminders.")
@@ -341,7 +507,8 @@ class reminders(commands.GroupCog, name="reminders"):
     async def allReminders(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         async with self.bot.session as session:
-            reminders: Sequence[Reminder] = (await session.scalars(select(Reminder))).all()
+            stmt = select(Reminder).order_by(Reminder.send_time, Reminder.id).limit(reminder_list_limit)
+            reminders: Sequence[Reminder] = (await session.scalars(stmt)).all()
             embed = discord.Embed(title="Reminders", description="All reminders.")
             if reminders:
                 msg = "\n".join(
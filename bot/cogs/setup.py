@@ -5,8 +5,9 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
-from bot.database.models import CourseConfig, StatisticsConfig, Course
-from sqlalchemy import select
+from bot.database.models import CourseConfig, StatisticsChannel, StatisticsConfig, Course
+from bot.lib.matcher import validate_pattern
+from sqlalchemy import delete, select
 
 cog_name = "setup"
 
@@ -18,6 +19,9 @@ class setupCog(commands.Cog):
         self.log = bot.log
 
     setup_group = app_commands.Group(name="setup", description="Setup a feature")
+    scream_channels_group = app_commands.Group(
+        name="screamchannels", description="Configure the channels screams are counted in", parent=setup_group
+    )
 
     @setup_group.command(
         description="Configure the void screams feature",
@@ -34,6 +38,7 @@ class setupCog(commands.Cog):
         major_threshold: Optional[int] = None,
         minor_role: Optional[discord.Role] = None,
         major_role: Optional[discord.Role] = None,
+        dedupe_window: Optional[int] = None,
     ):
         await interaction.response.defer(ephemeral=True)
         module_name = "statistics"
@@ -41,27 +46,32 @@ class setupCog(commands.Cog):
         if (modules := self.bot.modules.get(module_name)) is None:
             return await interaction.followup.send(f"Error: {module_name} module not loaded")
 
-        if (module := modules.get(interaction.guild_id)) is None:
-            return await interaction.followup.send(
-                f"Error: {module_name} module not loaded in {interaction.guild.name}"
-            )
+        module = await modules.get(interaction.guild_id)
         # Set module config attributes
         if regexp_primary:
             try:
-                regexp_primary = re.compile(regexp_primary)
+                regexp_primary = await validate_pattern(regexp_primary)
             except re.error:
                 return await interaction.followup.send("Error: Primary Regex invalid")
+            except ValueError as e:
+                return await interaction.followup.send(f"Error: Primary Regex too slow: {e}")
         if regexp_secondary:
             try:
-                regexp_secondary = re.compile(regexp_secondary)
+                regexp_secondary = await validate_pattern(regexp_secondary)
             except re.error:
                 return await interaction.followup.send("Error: Secondary Regex invalid")
+            except ValueError as e:
+                return await interaction.followup.send(f"Error: Secondary Regex too slow: {e}")
         if minor_threshold is not None and minor_threshold < 0:
             return await interaction.followup.send("Error: Minor Threshold must be greater than 0")
         if major_threshold is not None and major_threshold < 0:
             return await interaction.followup.send("Error: Major Threshold must be greater than 0")
         if minor_threshold is not None and major_threshold is not None and minor_threshold > major_threshold:
             return await interaction.followup.send("Error: Minor Threshold must be less than Major Threshold")
+        if dedupe_window is not None and not 0 <= dedupe_window <= module.max_dedupe_window:
+            return await interaction.followup.send(
+                f"Error: Dedupe Window must be between 0 and {module.max_dedupe_window} seconds"
+            )
 
         attrs = [
             "channel",
@@ -71,6 +81,7 @@ class setupCog(commands.Cog):
             "major_threshold",
             "minor_role",
             "major_role",
+            "dedupe_window",
         ]
 
         for attr in attrs:
@@ -87,6 +98,7 @@ class setupCog(commands.Cog):
             regexp_secondary = regexp_secondary.pattern if regexp_secondary else module.regexp_secondary.pattern
             minor_threshold = minor_threshold if minor_threshold else module.minor_threshold
             major_threshold = major_threshold if major_threshold else module.major_threshold
+            dedupe_window = dedupe_window if dedupe_window is not None else module.dedupe_window
             if row is None:
                 row = StatisticsConfig(
                     guild_id=interaction.guild_id,
@@ -97,6 +109,7 @@ class setupCog(commands.Cog):
                     major_threshold=major_threshold,
                     minor_role_id=minor_role_id,
                     major_role_id=major_role_id,
+                    dedupe_window=dedupe_window,
                 )
             else:
                 row.channel_id = channel_id
@@ -106,8 +119,10 @@ class setupCog(commands.Cog):
                 row.major_threshold = major_threshold
                 row.minor_role_id = minor_role_id
                 row.major_role_id = major_role_id
+                row.dedupe_window = dedupe_window
             session.add(row)
             await session.commit()
+        self.bot.dispatch("config_update", module_name, interaction.guild_id)
         # Send response
         embed = discord.Embed(title=f"{module_name}", color=discord.Color.magenta())
 
@@ -125,9 +140,81 @@ class setupCog(commands.Cog):
             embed.add_field(name="Major Threshold", value=module.major_threshold)
         if module.major_role.id is not None:
             embed.add_field(name="Major Role", value=module.major_role.mention)
+        if module.dedupe_window:
+            embed.add_field(name="Dedupe Window", value=f"{module.dedupe_window}s")
 
         await interaction.followup.send(embed=embed)
 
+    async def scream_channels(self, guild_id: int) -> list[int]:
+        """
+        Get the ids of every channel screams are counted in for a guild
+
+        :param guild_id: the guild id
+        :return: the channel set with /setup statistics first, then the added channels
+        """
+        async with self.bot.session as session:
+            row = await session.get(StatisticsConfig, guild_id)
+            extra = (
+                await session.scalars(
+                    select(StatisticsChannel.channel_id)
+                    .where(StatisticsChannel.guild_id == guild_id)
+                    .order_by(StatisticsChannel.channel_id)
+                )
+            ).all()
+        channel_ids = [row.channel_id] if row is not None and row.channel_id is not None else []
+        return channel_ids + [cid for cid in extra if cid not in channel_ids]
+
+    def scream_channels_embed(self, channel_ids: list[int]) -> discord.Embed:
+        embed = discord.Embed(title="statistics", color=discord.Color.magenta())
+        embed.add_field(name="Channels", value=", ".join(f"<#{cid}>" for cid in channel_ids) or "None")
+        return embed
+
+    @scream_channels_group.command(name="add", description="Count screams in another channel")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.guild_only()
+    async def scream_channels_add(self, interaction: discord.Interaction, channel: discord.TextChannel):
+        await interaction.response.defer(ephemeral=True)
+        module_name = "statistics"
+
+        if self.bot.modules.get(module_name) is None:
+            return await interaction.followup.send(f"Error: {module_name} module not loaded")
+
+        async with self.bot.session as session:
+            if await session.get(StatisticsChannel, (interaction.guild_id, channel.id)) is None:
+                session.add(StatisticsChannel(guild_id=interaction.guild_id, channel_id=channel.id))
+                await session.commit()
+        self.bot.dispatch("config_update", module_name, interaction.guild_id)
+
+        channel_ids = await self.scream_channels(interaction.guild_id)
+        await interaction.followup.send(embed=self.scream_channels_embed(channel_ids))
+
+    @scream_channels_group.command(name="remove", description="Stop counting screams in a channel")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.guild_only()
+    async def scream_channels_remove(self, interaction: discord.Interaction, channel: discord.TextChannel):
+        await interaction.response.defer(ephemeral=True)
+        module_name = "statistics"
+
+        if self.bot.modules.get(module_name) is None:
+            return await interaction.followup.send(f"Error: {module_name} module not loaded")
+
+        async with self.bot.session as session:
+            row = await session.get(StatisticsConfig, interaction.guild_id)
+            if row is not None and row.channel_id == channel.id:
+                return await interaction.followup.send(
+                    "Error: This is the main scream channel, change it with /setup statistics"
+                )
+            await session.execute(
+                delete(StatisticsChannel).where(
+                    StatisticsChannel.guild_id == interaction.guild_id, StatisticsChannel.channel_id == channel.id
+                )
+            )
+            await session.commit()
+        self.bot.dispatch("config_update", module_name, interaction.guild_id)
+
+        channel_ids = await self.scream_channels(interaction.guild_id)
+        await interaction.followup.send(embed=self.scream_channels_embed(channel_ids))
+
     @setup_group.command(
         description="Configure the course feature",
     )
@@ -146,10 +233,7 @@ class setupCog(commands.Cog):
         if (modules := self.bot.modules.get(module_name)) is None:
             return await interaction.followup.send(f"Error: {module_name} module not loaded")
 
-        if (module := modules.get(interaction.guild_id)) is None:
-            return await interaction.followup.send(
-                f"Error: {module_name} module not loaded in {interaction.guild.name}"
-            )
+        module = await modules.get(interaction.guild_id)
 
         attrs = [
             "auto_delete",
@@ -204,6 +288,7 @@ class setupCog(commands.Cog):
                         session.add(Course(guild_id=interaction.guild_id, course_code=code))
             
             await session.commit()
+        self.bot.dispatch("config_update", module_name, interaction.guild_id)
         # Send response
         embed = discord.Embed(title=f"{module_name}", color=discord.Color.magenta())
 
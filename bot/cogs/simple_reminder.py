@@ -5,112 +5,212 @@ from typing import Optional
 
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
-from sqlalchemy import Sequence, select
+from discord.ext import commands
+from sqlalchemy import any_, delete, func, select, update
 
 from bot.database.models import Reminder
 from bot.lib.date import now_tz, _time
+from bot.lib.lease import claim
+from bot.lib.scheduler import Scheduler
 
 cog_name = "simple_reminder"
 
 # Only mention the user who created the reminder
 mention_only_user = discord.AllowedMentions(everyone=False, users=True, roles=False)
+# reminders that failed to send for a reason other than a missing channel are tried again after this many seconds
+retry_delay = 60
+# due reminders claimed and sent at once
+reminder_batch = 100
+# seconds a batch of claimed reminders is leased for, other workers claim them once it runs out
+reminder_lease = 300
+# reminders being sent at once across all channels
+delivery_concurrency = 10
+# reminders shown by /list_reminders, an embed holds at most 25 fields
+reminder_list_limit = 25
 
 
 class simple_reminder(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.log = bot.log
-        self.check_reminders_task = None
+        # reminder id -> send time, sleeps until the next reminder is due
+        self.scheduler: Scheduler[int] = Scheduler(cog_name, self.log, self.on_due, reconcile=self.seed)
+        self.delivery_limit = asyncio.Semaphore(delivery_concurrency)
         
     async def _init(self):
-        """Initialize the cog with database tables and start the polling task."""
+        """Initialize the cog with database tables and start the scheduler."""
         self.log.info(f"Initialised {self.__class__.__name__}")
 
         if self.bot.db is None:
             raise Exception("This cog requires a database to be enabled.")
 
-        # Start the reminder checking loop
-        self.check_reminders_task = self.check_reminders.start()
+        await self.seed()
+        self.scheduler.start()
 
     async def _destroy(self):
         """Cleanup when cog is unloaded."""
-        if self.check_reminders_task:
-            self.check_reminders_task.cancel()
-    
-    @tasks.loop(seconds=60)
+        await self.scheduler.stop()
+
+    async def seed(self):
+        """
+        Load the send times of every pending reminder into the scheduler.
+        Run at startup and periodically by the scheduler, in case reminders were added or removed elsewhere.
+        """
+        # reminders scheduled while the query runs aren't in its result, only those scheduled before it can be gone
+        known = set(self.scheduler.keys())
+        async with self.bot.session as session:
+            stmt = select(Reminder.id, Reminder.send_time).where(Reminder.repeat == False)
+            rows = dict((await session.execute(stmt)).all())
+        for rid in known - rows.keys():
+            self.scheduler.cancel(rid)
+        changed = 0
+        for rid, send_time in rows.items():
+            if self.scheduler.when(rid) != send_time:
+                self.scheduler.schedule(rid, send_time)
+                changed += 1
+        self.log.debug(f"Reconciled {len(rows)} reminders, {changed} scheduled")
+
+    async def on_due(self, rids: list[int]):
+        """Called by the scheduler once reminders are due."""
+        await self.check_reminders()
+
     async def check_reminders(self):
-        """Check for due reminders every minute instead of using sleep()."""
+        """Send every due reminder, this also picks up due reminders the scheduler doesn't know about."""
         try:
             now = now_tz()
             self.log.debug(f"Checking for reminders at {now}")
             
-            async with self.bot.session as session:
-                # Query only reminders that are due and not repeating
-                stmt = select(Reminder).where(Reminder.send_time <= now).where(Reminder.repeat == False)
-                due_reminders: Sequence[Reminder] = (await session.scalars(stmt)).all()
-                
-                if due_reminders:
-                    self.log.info(f"Found {len(due_reminders)} due reminders")
-                    
-                for reminder in due_reminders:
-                    rid, user_id, channel_id, message, send_time, requested_time, repeat = reminder
+            # Claim the due reminders a batch at a time so several workers can share them, a claimed reminder
+            # is leased to this worker until it is sent, reminders that failed to send stay leased until their retry
+            while True:
+                async with self.bot.session as session, session.begin():
+                    # Claim only reminders that are due and not repeating
+                    stmt = claim(
+                        Reminder,
+                        Reminder.send_time <= now,
+                        Reminder.repeat == False,
+                        now=now,
+                        lease=reminder_lease,
+                        order_by=(Reminder.send_time, Reminder.id),
+                        limit=reminder_batch,
+                    )
+                    due_reminders = [tuple(reminder) for reminder in (await session.scalars(stmt)).all()]
                     
-                    try:
-                        # Try to fetch the channel - this could fail if channel deleted
-                        channel = await self.bot.fetch_channel(channel_id)
-                        
-                        # Format timestamps for display
-                        req_ts = int(requested_time.timestamp())
-                        send_ts = int(send_time.timestamp())
-                        now_ts = int(now.timestamp())
-                        
-                        # Calculate how long ago the reminder was set
-                        duration = send_time - requested_time
-                        duration_seconds = duration.total_seconds()
-                        duration_text = self._format_duration(duration_seconds)
-                        
-                        # Create the message with both text and embed
-                        # Make the main message visible to everyone
-                        main_message = f"⏰ **REMINDER FOR <@{user_id}>** ⏰\n{message}"
-                        
-                        # Create a nice embed with additional details
-                        embed = discord.Embed(
-                            title="📝 Reminder Details",
-                            color=discord.Color.gold(),
-                            description=f"Reminder set to trigger after {duration_text}"
-                        )
-                        
-                        # Only add timing details in the embed
-                        embed.add_field(
-                            name="📊 Timing Information", 
-                            value=f"• Created: <t:{req_ts}:F>\n• Scheduled: <t:{send_ts}:F>\n• Delivered: <t:{now_ts}:F>", 
-                            inline=False
-                        )
-                        
-                        # Send the reminder with both text and embed components
-                        await channel.send(
-                            content=main_message,
-                            embed=embed,
-                            allowed_mentions=mention_only_user
-                        )
-                        
-                        # Remove the reminder from database after sending
-                        await session.delete(reminder)
-                        
-                    except discord.errors.NotFound:
-                        self.log.warning(f"Channel {channel_id} not found for reminder {rid}")
-                        await session.delete(reminder)
-                    except Exception as e:
-                        self.log.error(f"Error sending reminder {rid}: {e}")
-                        # Don't delete the reminder on other errors - it will retry next cycle
-                        
-                # Commit all changes to the database
-                await session.commit()
+                if not due_reminders:
+                    break
+                due_reminders.sort(key=lambda reminder: (reminder[4], reminder[0]))
+                await self.deliver(due_reminders)
+                
+                if len(due_reminders) < reminder_batch:
+                    break
+            
+            # Check the due reminders leased by other workers again once their lease runs out, in case they crashed
+            async with self.bot.session as session:
+                stmt = (
+                    select(Reminder.id, Reminder.claimed_until)
+                    .where(Reminder.send_time <= now)
+                    .where(Reminder.repeat == False)
+                    .where(Reminder.claimed_until > now)
+                    .order_by(Reminder.claimed_until)
+                    .limit(reminder_batch)
+                )
+                for rid, claimed_until in (await session.execute(stmt)).all():
+                    self.scheduler.schedule(rid, claimed_until)
                 
         except Exception as e:
             self.log.error(f"Error in check_reminders task: {e}")
-            # Task will automatically restart due to the loop decorator
+
+    async def deliver(self, due_reminders: list[tuple]):
+        """
+        Send a page of due reminders and delete the sent ones with a single statement.
+        Reminders for different channels are sent concurrently, those for the same channel one at a time
+        in send time order since Discord rate limits each channel separately.
+        """
+        start = now_tz()
+        # channel id -> its reminders, in send time order
+        channels: dict[int, list[tuple]] = {}
+        for reminder in due_reminders:
+            channels.setdefault(reminder[2], []).append(reminder)
+        done: list[int] = []
+        failed: list[int] = []
+        lateness: list[float] = []
+        
+        async def send_channel(channel_id: int, channel_reminders: list[tuple]):
+            # A partial channel sends without fetching the channel first
+            channel = self.bot.get_partial_messageable(channel_id)
+            for rid, user_id, _, message, send_time, requested_time, _ in channel_reminders:
+                try:
+                    async with self.delivery_limit:
+                        content, embed = self._reminder_message(user_id, message, send_time, requested_time)
+                        await channel.send(content=content, embed=embed, allowed_mentions=mention_only_user)
+                    done.append(rid)
+                    lateness.append((now_tz() - send_time).total_seconds())
+                except discord.errors.NotFound:
+                    self.log.warning(f"Channel {channel_id} not found for reminder {rid}")
+                    done.append(rid)
+                except Exception as e:
+                    self.log.error(f"Error sending reminder {rid}: {e}")
+                    # Don't delete the reminder on other errors - try again later
+                    failed.append(rid)
+        
+        await asyncio.gather(*(send_channel(cid, channel_reminders) for cid, channel_reminders in channels.items()))
+        
+        # Remove the sent reminders from the database, the failed ones stay leased to this worker until their retry
+        retry_at = now_tz() + timedelta(seconds=retry_delay)
+        if done or failed:
+            async with self.bot.session as session, session.begin():
+                if done:
+                    await session.execute(delete(Reminder).where(Reminder.id == any_(done)))
+                if failed:
+                    await session.execute(
+                        update(Reminder)
+                        .where(Reminder.id == any_(failed))
+                        .values(claimed_until=retry_at)
+                        .execution_options(synchronize_session=False)
+                    )
+        for rid in failed:
+            self.scheduler.schedule(rid, retry_at)
+        
+        elapsed = (now_tz() - start).total_seconds()
+        if lateness:
+            self.log.info(
+                f"Sent {len(lateness)}/{len(due_reminders)} reminders to {len(channels)} channels in {elapsed:.2f}s "
+                f"({len(lateness) / max(elapsed, 1e-3):.1f}/s), late by {sum(lateness) / len(lateness):.1f}s on average "
+                f"and {max(lateness):.1f}s at most"
+            )
+        else:
+            self.log.info(f"Sent none of {len(due_reminders)} due reminders in {elapsed:.2f}s")
+
+    def _reminder_message(self, user_id, message, send_time, requested_time) -> tuple[str, discord.Embed]:
+        """Build the reminder message and the embed with its timing details."""
+        # Format timestamps for display
+        req_ts = int(requested_time.timestamp())
+        send_ts = int(send_time.timestamp())
+        now_ts = int(now_tz().timestamp())
+        
+        # Calculate how long ago the reminder was set
+        duration = send_time - requested_time
+        duration_seconds = duration.total_seconds()
+        duration_text = self._format_duration(duration_seconds)
+        
+        # Create the message with both text and embed
+        # Make the main message visible to everyone
+        main_message = f"⏰ **REMINDER FOR <@{user_id}>** ⏰\n{message}"
+        
+        # Create a nice embed with additional details
+        embed = discord.Embed(
+            title="📝 Reminder Details",
+            color=discord.Color.gold(),
+            description=f"Reminder set to trigger after {duration_text}"
+        )
+        
+        # Only add timing details in the embed
+        embed.add_field(
+            name="📊 Timing Information", 
+            value=f"• Created: <t:{req_ts}:F>\n• Scheduled: <t:{send_ts}:F>\n• Delivered: <t:{now_ts}:F>", 
+            inline=False
+        )
+        return main_message, embed
             
     def _format_duration(self, seconds: int) -> str:
         """Format a duration in seconds to a human-readable string."""
@@ -156,11 +256,6 @@ class simple_reminder(commands.Cog):
         else:
             return f"{parts[0]} and {parts[1]}"
 
-    @check_reminders.before_loop
-    async def before_check_reminders(self):
-        """Wait until the bot is ready before starting the loop."""
-        await self.bot.wait_until_ready()
-
     async def add_reminder(self, user_id, channel_id, message, send_time, requested_time=None):
         """Add a new reminder to the database."""
         if requested_time is None:
@@ -178,6 +273,7 @@ class simple_reminder(commands.Cog):
             session.add(reminder)
             await session.commit()
             await session.refresh(reminder)
+            self.scheduler.schedule(reminder.id, send_time)
             return reminder.id
 
     @commands.command(
@@ -366,17 +462,31 @@ class simple_reminder(commands.Cog):
         await interaction.response.defer(ephemeral=True)
         
         async with self.bot.session as session:
-            stmt = select(Reminder).where(Reminder.user_id == interaction.user.id)
+            # The next reminders first, read from the (user_id, send_time) index
+            stmt = (
+                select(Reminder)
+                .where(Reminder.user_id == interaction.user.id)
+                .order_by(Reminder.send_time, Reminder.id)
+                .limit(reminder_list_limit)
+            )
             reminders = (await session.scalars(stmt)).all()
             
             if not reminders:
                 await interaction.followup.send("You have no active reminders.", ephemeral=True)
                 return
                 
+            count = len(reminders)
+            if count == reminder_list_limit:
+                count = await session.scalar(
+                    select(func.count()).select_from(Reminder).where(Reminder.user_id == interaction.user.id)
+                )
+            description = f"You have {count} active reminder(s)"
+            if count > len(reminders):
+                description += f", showing the next {len(reminders)}"
             embed = discord.Embed(
                 title="Your Reminders",
                 color=discord.Color.blue(),
-                description=f"You have {len(reminders)} active reminder(s)"
+                description=description
             )
             
             for reminder in reminders:
@@ -425,6 +535,7 @@ class simple_reminder(commands.Cog):
             # Delete the reminder
             await session.delete(reminder)
             await session.commit()
+            self.scheduler.cancel(reminder_id)
             
             await interaction.followup.send(
                 f"✅ Reminder #{reminder_id} has been cancelled.",
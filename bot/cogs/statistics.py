@@ -1,54 +1,249 @@
+import asyncio
+import heapq
 import re
 from datetime import datetime, time, timedelta
+from functools import partial
+from time import monotonic, perf_counter
 from typing import Optional
 
 import discord
 import pytz
 from discord import app_commands
 from discord.ext import commands, tasks
-from sqlalchemy import func, select
-
-from bot.database.models import Screams, StatisticsConfig
+from sqlalchemy import Date, case, cast, delete, func, literal, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+
+from bot.database.models import (
+    RollupState,
+    ScreamBackfill,
+    ScreamBackfillUser,
+    ScreamDaily,
+    ScreamEvent,
+    ScreamOutbox,
+    Screams,
+    StatisticsChannel,
+    StatisticsConfig,
+)
 from bot.lib import DefaultDiscordObject
+from bot.lib.cache import TTLCache
 from bot.lib.date import epoch, get_tz, now_tz
+from bot.lib.hydrate import get_channel, get_guild
+from bot.lib.leaderboard import Leaderboard
+from bot.lib.matcher import MAX_SCAN_LENGTH, ScreamMatcher, validate_pattern
+from bot.lib.queue import IngestQueue
+from bot.lib.registry import ConfigRegistry
 
 cog_name = "statistics"
 
 reset_time = time(hour=0, minute=0, second=0, microsecond=0, tzinfo=get_tz())
 
+# Scream counts are buffered in memory and written in bulk.
+# The buffer is flushed every `flush_interval` seconds or once `flush_threshold` users are pending.
+flush_interval = 10
+flush_threshold = 100
+# number of users shown for each leaderboard column
+leaderboard_top = 5
+# upper bound on rows per bulk upsert statement
+flush_chunk = 1000
+# user stats read from the database are reused for this many seconds, writes made by the bot update them
+stats_cache_ttl = 5 * 60
+stats_cache_size = 4096
+# buffered scream events are flushed with the counts, or sooner once this many are buffered
+event_threshold = 1000
+# scream events are added to the daily rollup every `rollup_interval` minutes, at most `rollup_batch` per run
+rollup_interval = 5
+rollup_batch = 100_000
+rollup_name = "scream_daily"
+# the most days /stats history shows, one line each
+history_max_days = 60
+# daily screams and flushes are run by workers off the gateway handler, see IngestQueue
+ingest_workers = 4
+ingest_queue_size = 1000
+ingest_spill_size = 10_000
+# how long shutting down waits for queued screams to be written
+ingest_drain_timeout = 30
+# messages read from the history before their screams are written and the progress is saved
+backfill_page_size = 500
+# guild configs kept in memory, others are loaded from the database when they are next used
+config_cache_size = 1024
+# stored patterns timed at once when the guilds are routed, each in its own python process
+pattern_validation_concurrency = 4
+# congratulations and roles are written to the outbox with the scream and delivered after it commits,
+# `outbox_batch` at a time, failed ones are retried after `outbox_retry_base` seconds doubling every attempt
+outbox_batch = 100
+outbox_poll_interval = 30
+outbox_retry_base = 5
+outbox_max_attempts = 8
+
+
+def leaderboard_query(guild_id: int, cols: tuple[str, ...], limit: int, with_ties: bool = False):
+    """
+    Build a single statement returning a guild's top `limit` users for each of the leaderboard columns.
+
+    Each column is ordered by and limited to `limit` rows, which the planner can answer by reading its
+    (guild_id, column) index in order. benchmarks/leaderboard.py compares it against one rank() query per column.
+
+    :param guild_id: the guild id
+    :param cols: the column names, see Leaderboard.columns
+    :param limit: the number of rows per column
+    :param with_ties: include users tied with the last row, so every user ranked up to `limit` is returned
+    :return: a statement with the rows (name, user_id, col, rank)
+    """
+    stmts = []
+    for name in cols:
+        column = getattr(Screams, name)
+        top = (
+            select(Screams.user_id, column.label("col"))
+            .where(Screams.guild_id == guild_id)
+            .order_by(column.desc())
+            .fetch(limit, with_ties=with_ties)
+        ).subquery()
+        stmts.append(
+            select(
+                literal(name).label("name"),
+                top.c.user_id,
+                top.c.col,
+                func.rank().over(order_by=top.c.col.desc()).label("rank"),
+            )
+        )
+    return union_all(*stmts)
+
+
+def rank_query(guild_id: int, uid: int):
+    """
+    Build a statement with a user's value and rank in a guild for each of the leaderboard columns.
+
+    Each rank is one plus the COUNT(*) of the guild's users with a higher value, which the planner can answer
+    with a range scan of the (guild_id, column) index. benchmarks/rank.py compares it against window functions.
+
+    :param guild_id: the guild id
+    :param uid: the user id
+    :return: a statement with the row (total, total_rank, streak, streak_rank, ...), no row if the user has no stats
+    """
+    user = aliased(Screams)
+    columns = []
+    for name in Leaderboard.columns:
+        column, value = getattr(Screams, name), getattr(user, name)
+        above = select(func.count()).select_from(Screams).where(Screams.guild_id == guild_id).where(column > value)
+        columns += [value.label(name), (above.scalar_subquery() + 1).label(f"{name}_rank")]
+    return select(*columns).where(user.guild_id == guild_id).where(user.user_id == uid)
+
+
+async def merged_history(channels: list[discord.abc.Messageable], after, before):
+    """
+    Read the history of several channels oldest first as one stream in snowflake order
+
+    :param channels: the channels
+    :param after: only messages after this object
+    :param before: only messages before this object
+    """
+    histories = [channel.history(limit=None, after=after, before=before, oldest_first=True) for channel in channels]
+    # (message id, channel index, message), the next message of each channel
+    heads = []
+    for i, history in enumerate(histories):
+        if (message := await anext(history, None)) is not None:
+            heads.append((message.id, i, message))
+    heapq.heapify(heads)
+    while heads:
+        _, i, message = heapq.heappop(heads)
+        yield message
+        if (message := await anext(histories[i], None)) is not None:
+            heapq.heappush(heads, (message.id, i, message))
+
+
+# the columns of a users backfill stats that backfill_scream updates for primary screams
+backfill_streak_columns = ("streak", "streak_last", "best_streak", "last_day", "daily")
+
+
+def backfill_scream(user: ScreamBackfillUser, created: datetime, primary: bool):
+    """
+    Count a scream read from the history, the same way a live scream would be counted
+
+    :param user: the users backfill stats
+    :param created: when the message was sent
+    :param primary: if the message matched the primary regex and can continue the users streak
+    """
+    user.total += 1
+    if not primary:
+        return
+    day = created.astimezone(get_tz()).date()
+    if user.last_day == day:
+        return
+    if user.last_day is not None and day - user.last_day == timedelta(days=1):
+        user.streak += 1
+    else:
+        if user.streak > 0:
+            user.streak_last = user.streak
+        user.streak = 1
+    user.best_streak = max(user.best_streak, user.streak)
+    user.last_day = day
+    user.daily = created
+
 
 class statistics(commands.Cog):
     class Config:
+        # the longest dedupe window /setup accepts, counted times older than it are dropped on every flush
+        max_dedupe_window = 300
+
         def __init__(self) -> None:
             self.regexp_primary = re.compile(r"[aA][arRgGAhH]{5,}")
             self.regexp_secondary = re.compile(r":scream1:")
             self.channel = DefaultDiscordObject()
+            # ids of every channel screams are counted in, `channel` and those in statistics_channels
+            self.channel_ids: frozenset[int] = frozenset()
             self.minor_threshold = 100
             self.major_threshold = 250
             self.minor_role = DefaultDiscordObject()
             self.major_role = DefaultDiscordObject()
+            # seconds after a counted scream during which the users further screams are not counted, 0 to count all
+            self.dedupe_window = 0
+            self._matcher = None
+
+        @property
+        def matcher(self) -> ScreamMatcher:
+            """
+            The compiled matcher for the current primary and secondary regex.
+            It is rebuilt whenever either regex is replaced.
+            """
+            matcher = self._matcher
+            if (
+                matcher is None
+                or matcher.primary is not self.regexp_primary
+                or matcher.secondary is not self.regexp_secondary
+            ):
+                matcher = self._matcher = ScreamMatcher(self.regexp_primary, self.regexp_secondary)
+            return matcher
 
         @classmethod
-        async def from_row(cls, bot: commands.Bot, row: StatisticsConfig):
+        async def from_row(
+            cls,
+            bot: commands.Bot,
+            row: StatisticsConfig,
+            channel_ids: list[int] = None,
+            patterns: dict[str, re.Pattern | None] = None,
+        ):
             """
             Create a new Config object from a row in the database
 
             :param commands.Bot bot: the bot instance
             :param StatisticsConfig row: the stored DB config
+            :param list[int] channel_ids: the guild's channels in statistics_channels
+            :param dict patterns: the stored patterns -> compiled, None for those that failed validation
             :raises ValueError: if the row is None
             """
             if row is None:
                 raise ValueError("Could not find a row in the database for this guild.")
             obj = cls()
+            obj.channel_ids = frozenset(channel_ids or ())
+            if row.channel_id is not None:
+                obj.channel_ids |= {row.channel_id}
             try:
-                guild: discord.Guild | None = await bot.fetch_guild(row.guild_id)
+                guild: discord.Guild | None = await get_guild(bot, row.guild_id)
                 if guild is None:
                     return obj
-                try:
-                    channel = await guild.fetch_channel(row.channel_id)
+                if (channel := await get_channel(guild, row.channel_id)) is not None:
                     obj.channel = channel
-                except discord.errors.NotFound:
-                    pass
                 if (minor_role := guild.get_role(row.minor_role_id)) is not None:
                     obj.minor_role = minor_role
                 if (major_role := guild.get_role(row.major_role_id)) is not None:
@@ -56,16 +251,21 @@ class statistics(commands.Cog):
             except discord.Forbidden:
                 bot.log.warning(f"Could not find a channel or role for guild {row.guild_id}")
                 pass
-            try:
-                if row.regexp_primary is not None:
-                    obj.regexp_primary = re.compile(row.regexp_primary)
-                if row.regexp_secondary is not None:
-                    obj.regexp_secondary = re.compile(row.regexp_secondary)
-            except re.error:
-                bot.log.warning(f"Could not compile the regex for guild {row.guild_id}")
-                pass
+            # patterns that are invalid or too slow are replaced with the defaults, see validated_pattern
+            patterns = patterns or {}
+            if row.regexp_primary is not None:
+                if (primary := patterns.get(row.regexp_primary)) is not None:
+                    obj.regexp_primary = primary
+                else:
+                    bot.log.warning(f"Using the default primary regex for guild {row.guild_id}")
+            if row.regexp_secondary is not None:
+                if (secondary := patterns.get(row.regexp_secondary)) is not None:
+                    obj.regexp_secondary = secondary
+                else:
+                    bot.log.warning(f"Using the default secondary regex for guild {row.guild_id}")
             obj.minor_threshold = row.minor_threshold
             obj.major_threshold = row.major_threshold
+            obj.dedupe_window = row.dedupe_window or 0
 
             return obj
 
@@ -77,9 +277,44 @@ class statistics(commands.Cog):
         self.log = bot.log
         self.log.info(f"Loaded {self.__class__.__name__}")
 
-        bot.modules[cog_name] = {}
-        for guild in bot.guilds:
-            bot.modules[cog_name][guild.id] = self.Config()
+        # (guild id, user id) -> screams not yet written to the database
+        self.pending: dict[tuple[int, int], int] = {}
+        # scream events not yet written to the database
+        self.events: list[dict] = []
+        # (guild id, user id) -> time of their last daily scream, for users known to have screamed today
+        self.screamed_today: dict[tuple[int, int], datetime] = {}
+        # (guild id, user id) -> monotonic time of their last counted scream, for guilds with a dedupe window
+        self.last_counted: dict[tuple[int, int], float] = {}
+        # screams not counted because they were in a dedupe window
+        self.suppressed = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_queued = False
+        self.ingest = IngestQueue(
+            cog_name, self.log, maxsize=ingest_queue_size, workers=ingest_workers, spill_size=ingest_spill_size
+        )
+        self.bot.shutdown_hooks.append(self.shutdown)
+        # guild id -> top users for each leaderboard column, kept up to date from every write
+        self.leaderboards: dict[int, Leaderboard] = {}
+        # (guild id, user id) -> detached Screams rows, updated by every write so lookups skip the database
+        self.stats_cache: TTLCache[tuple[int, int], Screams] = TTLCache(maxsize=stats_cache_size, ttl=stats_cache_ttl)
+        # guild id -> running history backfill
+        self.backfills: dict[int, asyncio.Task] = {}
+        # guild id -> scream channel ids routed to on_scream
+        self.channels: dict[int, frozenset[int]] = {}
+        # stored pattern -> its validation, shared by every guild using the pattern
+        self.patterns: dict[str, asyncio.Task] = {}
+        # validates the stored patterns and then routes the guilds, started by _init
+        self.routing_task: asyncio.Task | None = None
+        # delivers the outbox, woken when a scream adds to it
+        self.outbox_task: asyncio.Task | None = None
+        self.outbox_wake = asyncio.Event()
+        self.outbox_delivered = 0
+        self.outbox_retried = 0
+        self.outbox_dropped = 0
+
+        # guild id -> Config, loaded on first use
+        self.configs: ConfigRegistry[statistics.Config] = ConfigRegistry(self.load_config, maxsize=config_cache_size)
+        bot.modules[cog_name] = self.configs
 
         self.stats_menu = app_commands.ContextMenu(
             name="statistics",
@@ -108,22 +343,176 @@ class statistics(commands.Cog):
         async with self.bot.db.begin() as conn:
             await conn.run_sync(Screams.__table__.create, checkfirst=True)
             await conn.run_sync(StatisticsConfig.__table__.create, checkfirst=True)
-
-        for guild in self.bot.guilds:
-            await self.enroll(guild.id)
-            
+            await conn.run_sync(StatisticsChannel.__table__.create, checkfirst=True)
+            await conn.run_sync(ScreamEvent.__table__.create, checkfirst=True)
+            await conn.run_sync(ScreamDaily.__table__.create, checkfirst=True)
+            await conn.run_sync(RollupState.__table__.create, checkfirst=True)
+            await conn.run_sync(ScreamBackfill.__table__.create, checkfirst=True)
+            await conn.run_sync(ScreamBackfillUser.__table__.create, checkfirst=True)
+            await conn.run_sync(ScreamOutbox.__table__.create, checkfirst=True)
+
+        # stored patterns are timed before their guilds are routed, so configs never time them on the message path
+        self.routing_task = asyncio.create_task(self.route_all(), name=f"{cog_name}-route")
+
+        self.ingest.start()
         self.reset_streak.start()
-
-    def cog_unload(self):
+        self.flush_screams.start()
+        self.rollup_screams.start()
+        self.outbox_task = asyncio.create_task(self.outbox_worker(), name=f"{cog_name}-outbox")
+
+    async def cog_unload(self):
+        if self.routing_task is not None:
+            self.routing_task.cancel()
+        self.bot.router.remove_handler(self.on_scream)
         self.reset_streak.cancel()
+        self.flush_screams.cancel()
+        self.rollup_screams.cancel()
+        # backfills resume from their checkpoint when they are run again
+        for task in self.backfills.values():
+            task.cancel()
+        if self.shutdown in self.bot.shutdown_hooks:
+            self.bot.shutdown_hooks.remove(self.shutdown)
+        await self.shutdown()
+
+    async def shutdown(self):
+        """
+        Stop delivering the outbox, finish the queued screams and write everything buffered to the database
+        """
+        # undelivered effects stay in the outbox until the cog is loaded again
+        if self.outbox_task is not None:
+            self.outbox_task.cancel()
+            await asyncio.gather(self.outbox_task, return_exceptions=True)
+            self.outbox_task = None
+        await self.ingest.drain(ingest_drain_timeout)
+        await self.flush()
+
+    async def load_config(self, guild_id: int) -> "statistics.Config":
+        """
+        Load the config of a guild from the database, see ConfigRegistry
 
-    async def enroll(self, guild_id):
+        :param guild_id: the guild id
+        :return: the config, the defaults if the guild has not been set up
+        """
         async with self.bot.session as session:
             self.log.info(f"{cog_name} - Enrolling guild {guild_id}")
             row = await session.get(StatisticsConfig, guild_id)
-            if row is None:
-                return
-            self.bot.modules[cog_name][guild_id] = await self.Config.from_row(self.bot, row)
+            channel_ids = (
+                await session.scalars(
+                    select(StatisticsChannel.channel_id).where(StatisticsChannel.guild_id == guild_id)
+                )
+            ).all()
+        if row is None:
+            config = self.Config()
+            config.channel_ids = frozenset(channel_ids)
+            return config
+        patterns = {
+            pattern: await self.validated_pattern(pattern)
+            for pattern in (row.regexp_primary, row.regexp_secondary)
+            if pattern is not None
+        }
+        return await self.Config.from_row(self.bot, row, list(channel_ids), patterns)
+
+    async def validated_pattern(self, pattern: str) -> re.Pattern | None:
+        """
+        Compile and time a stored pattern with validate_pattern, once per pattern however many guilds use it.
+        The stored patterns are validated when the guilds are routed, so this only waits for patterns saved since.
+
+        :param pattern: the stored pattern
+        :return: the compiled pattern, None if it is invalid or too slow
+        """
+        task = self.patterns.get(pattern)
+        if task is None:
+            task = self.patterns[pattern] = asyncio.ensure_future(self._validate_pattern(pattern))
+        return await asyncio.shield(task)
+
+    async def _validate_pattern(self, pattern: str) -> re.Pattern | None:
+        try:
+            return await validate_pattern(pattern)
+        except re.error:
+            self.log.warning(f"Could not compile the stored regex {pattern!r}")
+        except ValueError as e:
+            self.log.warning(f"Ignoring the slow stored regex {pattern!r}: {e}")
+        return None
+
+    def route(self, guild_id: int, channel_ids: frozenset[int]):
+        """
+        Send the messages of a guild's scream channels to on_scream, replacing its previous scream channels
+
+        :param guild_id: the guild id
+        :param channel_ids: the scream channel ids, empty to stop routing the guild
+        """
+        old = self.channels.pop(guild_id, frozenset())
+        for channel_id in old - channel_ids:
+            self.bot.router.remove_channel(channel_id, self.on_scream)
+        for channel_id in channel_ids - old:
+            self.bot.router.add_channel(channel_id, self.on_scream)
+        if channel_ids:
+            self.channels[guild_id] = channel_ids
+
+    async def route_all(self):
+        """
+        Validate the stored patterns and then route the scream channels of every configured guild, only the
+        channel ids and patterns are loaded not the configs
+        """
+        stored = union_all(
+            select(StatisticsConfig.regexp_primary).where(StatisticsConfig.regexp_primary.is_not(None)),
+            select(StatisticsConfig.regexp_secondary).where(StatisticsConfig.regexp_secondary.is_not(None)),
+        )
+        async with self.bot.session as session:
+            patterns = set((await session.scalars(stored)).all())
+        limit = asyncio.Semaphore(pattern_validation_concurrency)
+
+        async def validate(pattern: str):
+            async with limit:
+                await self.validated_pattern(pattern)
+
+        await asyncio.gather(*(validate(pattern) for pattern in patterns))
+        self.log.info(f"{cog_name} - Validated {len(patterns)} stored patterns")
+
+        stmt = union_all(
+            select(StatisticsConfig.guild_id, StatisticsConfig.channel_id).where(
+                StatisticsConfig.channel_id.is_not(None)
+            ),
+            select(StatisticsChannel.guild_id, StatisticsChannel.channel_id),
+        )
+        async with self.bot.session as session:
+            rows = (await session.execute(stmt)).all()
+        channels: dict[int, set[int]] = {}
+        for guild_id, channel_id in rows:
+            channels.setdefault(guild_id, set()).add(channel_id)
+        for guild_id, channel_ids in channels.items():
+            self.route(guild_id, frozenset(channel_ids))
+        self.log.info(f"{cog_name} - Routed {len(rows)} scream channels in {len(channels)} guilds")
+
+    @commands.Cog.listener()
+    async def on_config_update(self, module: str, guild_id: int):
+        """
+        Reload the config after it was changed with /setup and route its scream channels again
+
+        :param module: the name of the updated module
+        :param guild_id: the guild id
+        """
+        if module != cog_name:
+            return
+        self.configs.pop(guild_id)
+        config = await self.configs.get(guild_id)
+        self.route(guild_id, config.channel_ids)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        # drop anything left from an earlier stay, a config saved then is routed again
+        self.configs.pop(guild.id)
+        self.leaderboards.pop(guild.id, None)
+        config = await self.configs.get(guild.id)
+        self.route(guild.id, config.channel_ids)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.route(guild.id, frozenset())
+        self.configs.pop(guild.id)
+        self.leaderboards.pop(guild.id, None)
+        if (task := self.backfills.get(guild.id)) is not None:
+            task.cancel()
 
     @property
     def today(self) -> datetime:
@@ -134,111 +523,733 @@ class statistics(commands.Cog):
         """
         return now_tz().replace(hour=0, minute=0, second=0, microsecond=0).astimezone(pytz.utc)
 
-    async def get_screams(self, uid: int) -> Screams | None:
+    async def get_screams(self, guild_id: int, uid: int) -> Screams | None:
         """
-        Retrieve the screams for a user from the database
+        Retrieve the screams for a user in a guild, from the cache or the database.
+        The returned row is shared with the cache, pop it from `stats_cache` before modifying it.
 
+        :param guild_id: the guild id
         :param uid: the user id
         :return Screams | None: The row from the database or None
         """
+        row = self.stats_cache.get((guild_id, uid))
+        if row is not None:
+            return row
+        async with self.bot.session as session:
+            row = await session.get(Screams, (guild_id, uid))
+        if row is not None:
+            self.stats_cache.set((guild_id, uid), row)
+        return row
+
+    def update_cached(self, guild_id: int, uid: int, **values):
+        """
+        Apply a write to the cached row for a user, if there is one
+
+        :param guild_id: the guild id
+        :param uid: the user id
+        :param values: the column name -> the new value
+        """
+        row = self.stats_cache.peek((guild_id, uid))
+        if row is not None:
+            for col, value in values.items():
+                setattr(row, col, value)
+
+    def leaderboard_for(self, guild_id: int) -> Leaderboard:
+        """
+        Get the leaderboard index for a guild, it is seeded the first time it is shown
+
+        :param guild_id: the guild id
+        :return Leaderboard: the guild's leaderboard
+        """
+        board = self.leaderboards.get(guild_id)
+        if board is None:
+            board = self.leaderboards[guild_id] = Leaderboard(leaderboard_top)
+        return board
+
+    async def seed_leaderboard(self, guild_id: int, *cols: str):
+        """
+        Load a guild's top rows for the given leaderboard columns from the database
+
+        :param guild_id: the guild id
+        :param cols: the column names to seed, see Leaderboard.columns
+        """
+        leaderboard = self.leaderboard_for(guild_id)
+        capacity = max(leaderboard[col].capacity for col in cols)
+        # flushes keep updating the leaderboard during the query, their values are newer than the rows read
+        updates = leaderboard.record()
+        try:
+            async with self.bot.session as session:
+                result = (await session.execute(leaderboard_query(guild_id, cols, capacity))).all()
+        finally:
+            leaderboard.stop(updates)
+        for col in cols:
+            rows = sorted(((row.user_id, row.col) for row in result if row.name == col), key=lambda r: -r[1])
+            leaderboard.seed(col, rows[: leaderboard[col].capacity], updates)
+
+    def has_screamed_today(self, guild_id: int, uid: int) -> bool:
+        """
+        Check if a user is known to have screamed today in a guild without querying the database
+
+        :param guild_id: the guild id
+        :param uid: the user id
+        :return bool: True if the user has screamed today, False if it is not known
+        """
+        daily = self.screamed_today.get((guild_id, uid))
+        return daily is not None and daily >= self.today
+
+    def log_event(self, message: discord.Message, daily: bool = False):
+        """
+        Buffer a scream event, it is written with the next flush
+
+        :param discord.Message message: the scream
+        :param bool daily: if it was the users first scream of the day
+        """
+        self.events.append(
+            {"guild_id": message.guild.id, "user_id": message.author.id, "created": message.created_at, "daily": daily}
+        )
+
+    async def flush(self):
+        """
+        Write all buffered scream counts to the database as a single bulk upsert, along with the buffered events
+        """
+        self._flush_queued = False
+        async with self._flush_lock:
+            if not self.pending and not self.events:
+                return
+            pending, self.pending = self.pending, {}
+            events, self.events = self.events, []
+            rows = [
+                {
+                    "guild_id": guild_id,
+                    "user_id": uid,
+                    "total": count,
+                    "streak": 0,
+                    "streak_last": 0,
+                    "best_streak": 0,
+                    "daily": epoch(),
+                    "streak_keeper": epoch(),
+                }
+                for (guild_id, uid), count in pending.items()
+            ]
+            updated = []
+            try:
+                async with self.bot.session as session, session.begin():
+                    for i in range(0, len(rows), flush_chunk):
+                        stmt = insert(Screams).values(rows[i : i + flush_chunk])
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=[Screams.guild_id, Screams.user_id],
+                            set_={"total": Screams.total + stmt.excluded.total},
+                        ).returning(
+                            Screams.guild_id, Screams.user_id, Screams.total, Screams.streak, Screams.best_streak
+                        )
+                        updated.extend((await session.execute(stmt)).all())
+                    for i in range(0, len(events), flush_chunk):
+                        await session.execute(insert(ScreamEvent), events[i : i + flush_chunk])
+            except Exception as e:
+                # keep the counts and events so they are retried on the next flush
+                for key, count in pending.items():
+                    self.pending[key] = self.pending.get(key, 0) + count
+                self.events[:0] = events
+                self.log.error(f"Failed to flush {len(pending)} buffered screams and {len(events)} events: {e}")
+                return
+            for guild_id, uid, total, streak, best_streak in updated:
+                self.leaderboard_for(guild_id).update(uid, total=total, streak=streak, best_streak=best_streak)
+                self.update_cached(guild_id, uid, total=total)
+            self.log.debug(f"Flushed buffered screams for {len(rows)} users and {len(events)} events")
+
+    async def rollup(self):
+        """
+        Add the scream events written since the last rollup to the per guild daily totals.
+
+        Events are only written by `flush`, so holding the flush lock means every event up to the highest id
+        is committed and the rollup can continue from the last id it included.
+        """
+        day = func.date(func.timezone(get_tz().zone, ScreamEvent.created))
+        async with self._flush_lock, self.bot.session as session, session.begin():
+            state = await session.get(RollupState, rollup_name)
+            last_id = 0 if state is None else state.last_id
+            max_id = await session.scalar(select(func.max(ScreamEvent.id)))
+            if max_id is None or max_id <= last_id:
+                return
+            max_id = min(max_id, last_id + rollup_batch)
+            new = (
+                select(ScreamEvent.guild_id, day.label("day"), ScreamEvent.daily)
+                .where(ScreamEvent.id > last_id)
+                .where(ScreamEvent.id <= max_id)
+            ).subquery()
+            events = select(new.c.guild_id, new.c.day, func.count(), func.count().filter(new.c.daily)).group_by(
+                new.c.guild_id, new.c.day
+            )
+            stmt = insert(ScreamDaily).from_select(["guild_id", "day", "screams", "screamers"], events)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ScreamDaily.guild_id, ScreamDaily.day],
+                set_={
+                    "screams": ScreamDaily.screams + stmt.excluded.screams,
+                    "screamers": ScreamDaily.screamers + stmt.excluded.screamers,
+                },
+            )
+            await session.execute(stmt)
+            stmt = insert(RollupState).values(name=rollup_name, last_id=max_id)
+            await session.execute(
+                stmt.on_conflict_do_update(index_elements=[RollupState.name], set_={"last_id": stmt.excluded.last_id})
+            )
+        self.log.debug(f"Rolled up scream events {last_id + 1} to {max_id}")
+
+    async def record_daily(self, message: discord.Message, config: Config, pending: int = 0):
+        """
+        Write a users first primary scream of the day straight to the database and, in the same transaction,
+        add the congratulations / roles for their new streak to the outbox, they are delivered after it commits.
+
+        The total, streak, best streak and daily time are computed by the database in a single
+        INSERT ... ON CONFLICT DO UPDATE so concurrent screams from the same user can't lose updates.
+
+        :param discord.Message message: The message object
+        :param Config config: the guild config
+        :param int pending: buffered screams for the user that have not been written yet
+        :return bool: True if this was the users first scream of the day
+        """
+        author = message.author
+        key = (message.guild.id, author.id)
+        now = now_tz()
+        today = self.today
+        yesterday = today - timedelta(days=1)
+
+        stmt = insert(Screams).values(
+            guild_id=message.guild.id,
+            user_id=author.id,
+            total=1 + pending,
+            streak=1,
+            streak_last=0,
+            best_streak=1,
+            daily=now,
+            streak_keeper=epoch(),
+        )
+        # values on the right hand side refer to the existing row
+        new_day = Screams.daily < today
+        streak = case((Screams.daily > yesterday, Screams.streak), else_=0) + 1
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Screams.guild_id, Screams.user_id],
+            set_={
+                "total": Screams.total + stmt.excluded.total,
+                "streak": case((new_day, streak), else_=Screams.streak),
+                "streak_last": case(
+                    (new_day & (Screams.daily <= yesterday), Screams.streak), else_=Screams.streak_last
+                ),
+                "best_streak": case((new_day, func.greatest(Screams.best_streak, streak)), else_=Screams.best_streak),
+                "daily": case((new_day, stmt.excluded.daily), else_=Screams.daily),
+            },
+        ).returning(Screams.total, Screams.streak, Screams.streak_last, Screams.best_streak, Screams.daily)
+
+        try:
+            async with self.bot.session as session, session.begin():
+                total, streak, streak_last, best_streak, daily = (await session.execute(stmt)).one()
+                # the daily time is only set to now if this was the first scream of the day
+                first = daily == now
+                if first:
+                    await session.execute(insert(ScreamOutbox), self.scream_effects(message, config, streak))
+        except Exception:
+            # keep the buffered screams so they are written on the next flush
+            self.pending[key] = self.pending.get(key, 0) + pending
+            raise
+        self.screamed_today[key] = daily
+        self.leaderboard_for(message.guild.id).update(author.id, total=total, streak=streak, best_streak=best_streak)
+        self.update_cached(
+            *key, total=total, streak=streak, streak_last=streak_last, best_streak=best_streak, daily=daily
+        )
+
+        if not first:
+            return False
+        self.outbox_wake.set()
+        return True
+
+    def scream_effects(self, message: discord.Message, config: Config, streak: int) -> list[dict]:
+        """
+        Build the outbox rows congratulating a user on their first scream of the day and awarding streak roles
+
+        :param discord.Message message: The message object
+        :param Config config: the guild config
+        :param int streak: the users new streak
+        :return list[dict]: ScreamOutbox rows, in the order they are delivered
+        """
+        author = message.author
+        now = now_tz()
+
+        def effect(action: str, content: str | None = None, role_id: int | None = None) -> dict:
+            return {
+                "guild_id": message.guild.id,
+                "action": action,
+                "channel_id": message.channel.id,
+                "user_id": author.id,
+                "role_id": role_id,
+                "content": content,
+                "not_before": now,
+            }
+
+        effects = [
+            effect(
+                "send", f"Congrats {author.mention} on your first scream of the day.\nYour current streak is: {streak}."
+            )
+        ]
+        if streak % 100 == 0:
+            effects.append(
+                effect(
+                    "send",
+                    "https://i.guim.co.uk/img/media/8a840f693b91fe67d42555b24c6334e9298f4680/251_1497_2178_1306/master/2178.jpg?width=1200&height=900&quality=85&auto=format&fit=crop&s=9ff658ed0e9b905fa583c592cc2342f5",
+                )
+            )
+            effects.append(effect("send", f"Congrats on reaching {streak}!"))
+        if streak == config.minor_threshold and config.minor_role.id is not None:
+            effects.append(effect("add_role", role_id=config.minor_role.id))
+        if streak == config.major_threshold and config.major_role.id is not None:
+            effects.append(effect("add_role", role_id=config.major_role.id))
+        return effects
+
+    async def deliver(self, row: ScreamOutbox):
+        """
+        Make the Discord request for an outbox row
+
+        :param ScreamOutbox row: the outbox row
+        """
+        if row.action == "send":
+            # a partial channel sends without fetching the channel first
+            await self.bot.get_partial_messageable(row.channel_id, guild_id=row.guild_id).send(row.content)
+        elif row.action == "add_role":
+            guild = self.bot.get_guild(row.guild_id)
+            if guild is None or (role := guild.get_role(row.role_id)) is None:
+                self.log.warning(f"Could not find the role {row.role_id} in guild {row.guild_id}")
+                return
+            member = guild.get_member(row.user_id) or await guild.fetch_member(row.user_id)
+            await member.add_roles(role)
+        else:
+            self.log.warning(f"Unknown outbox action {row.action}")
+
+    async def deliver_outbox(self) -> float:
+        """
+        Deliver the due rows of the outbox, oldest first.
+
+        Delivered rows and rows that can never succeed are deleted. Other failures are retried with an exponential
+        backoff, or after the wait Discord asked for when rate limited. Within a batch the later rows for the same
+        channel or user are held back with them, but a later batch may deliver newer rows for the same channel or
+        user before the retried ones, so effects are only ordered within a batch.
+
+        :return float: seconds until the outbox should be checked again
+        """
+        now = now_tz()
+        async with self.bot.session as session:
+            rows = (
+                await session.scalars(
+                    select(ScreamOutbox)
+                    .where(ScreamOutbox.not_before <= now)
+                    .order_by(ScreamOutbox.id)
+                    .limit(outbox_batch)
+                )
+            ).all()
+        done = []
+        retries = []
+        # (action, channel or user id) -> the time failed rows for it are retried at
+        blocked: dict[tuple[str, int], datetime] = {}
+        for row in rows:
+            target = (row.action, row.channel_id if row.action == "send" else row.user_id)
+            if (retry_at := blocked.get(target)) is not None:
+                retries.append({"id": row.id, "attempts": row.attempts, "not_before": retry_at})
+                continue
+            try:
+                await self.deliver(row)
+                done.append(row.id)
+                self.outbox_delivered += 1
+                continue
+            except discord.RateLimited as e:
+                attempts = row.attempts
+                retry_at = now_tz() + timedelta(seconds=e.retry_after)
+            except (discord.NotFound, discord.Forbidden) as e:
+                self.log.warning(f"Dropping the outbox {row.action} for guild {row.guild_id}: {e}")
+                done.append(row.id)
+                self.outbox_dropped += 1
+                continue
+            except Exception as e:
+                attempts = row.attempts + 1
+                if attempts >= outbox_max_attempts:
+                    self.log.error(
+                        f"Dropping the outbox {row.action} for guild {row.guild_id} after {attempts} attempts: {e}"
+                    )
+                    done.append(row.id)
+                    self.outbox_dropped += 1
+                    continue
+                retry_at = now_tz() + timedelta(seconds=outbox_retry_base * 2**row.attempts)
+            blocked[target] = retry_at
+            retries.append({"id": row.id, "attempts": attempts, "not_before": retry_at})
+            self.outbox_retried += 1
+
+        if done or retries:
+            async with self.bot.session as session, session.begin():
+                if done:
+                    await session.execute(delete(ScreamOutbox).where(ScreamOutbox.id.in_(done)))
+                if retries:
+                    await session.execute(update(ScreamOutbox), retries)
+        if len(rows) >= outbox_batch:
+            return 0
+        if retries:
+            next_retry = min(retry["not_before"] for retry in retries)
+            return min(max((next_retry - now_tz()).total_seconds(), 0), outbox_poll_interval)
+        return outbox_poll_interval
+
+    async def outbox_worker(self):
+        """
+        Deliver the outbox whenever a scream adds to it, and periodically for retries and rows left from a restart
+        """
+        while True:
+            self.outbox_wake.clear()
+            try:
+                delay = await self.deliver_outbox()
+            except Exception as e:
+                self.log.error(f"Failed to deliver the scream outbox: {e}")
+                delay = outbox_poll_interval
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.outbox_wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def backfill(
+        self, guild: discord.Guild, channels: list[discord.abc.Messageable], restart: bool = False
+    ) -> int:
+        """
+        Rebuild a guild's scream stats from the history of its scream channels.
+
+        The histories of the channels are read oldest first in pages, merged in snowflake order so each users
+        screams are counted in the order they were sent. Each page is classified with the guild's matcher and the
+        stats of the users in it are updated in scream_backfill_users, together with a checkpoint of the last
+        message read, so memory use doesn't grow with the history and an interrupted backfill resumes where it
+        stopped. The history is read up to a cutoff taken when the backfill starts, screams after it keep being
+        counted live. Once the cutoff is reached the stats replace the guild's rows in screams, plus whatever
+        was counted live since the cutoff.
+
+        :param guild: the guild
+        :param channels: every channel screams are counted in, the scream channel first
+        :param restart: discard the progress of an interrupted backfill
+        :return int: the number of messages read
+        """
+        matcher = (await self.configs.get(guild.id)).matcher
+        channel_ids = sorted(channel.id for channel in channels)
         async with self.bot.session as session:
-            return await session.get(Screams, uid)
+            checkpoint = await session.get(ScreamBackfill, guild.id)
+            if not (
+                restart
+                or checkpoint is None
+                or checkpoint.cutoff_id is None
+                or sorted(checkpoint.channel_ids or ()) != channel_ids
+            ):
+                cutoff_id, last_message_id, messages = (
+                    checkpoint.cutoff_id,
+                    checkpoint.last_message_id,
+                    checkpoint.messages,
+                )
+                self.log.info(f"Resuming the scream backfill for guild {guild.id} after {messages} messages")
+            else:
+                cutoff_id = await self.start_backfill(guild.id, channels[0].id, channel_ids)
+                last_message_id, messages = 0, 0
+        after = discord.Object(last_message_id) if last_message_id else None
+
+        page = []
+        async for message in merged_history(channels, after, discord.Object(cutoff_id)):
+            page.append(message)
+            if len(page) >= backfill_page_size:
+                messages = await self.backfill_page(guild.id, page, matcher, messages)
+                page.clear()
+        if page:
+            messages = await self.backfill_page(guild.id, page, matcher, messages)
+        await self.finish_backfill(guild.id, cutoff_id)
+        return messages
+
+    async def start_backfill(self, guild_id: int, channel_id: int, channel_ids: list[int]) -> int:
+        """
+        Take the cutoff of a new backfill and the users totals at it, discarding any earlier progress
+
+        :return int: the cutoff snowflake, history before it is backfilled
+        """
+        # screams already received are written first, so they are in the baseline and only counted from the history
+        if not await self.ingest.join(ingest_drain_timeout):
+            self.log.warning(f"The scream queue did not drain before the backfill of guild {guild_id}")
+        await self.flush()
+        async with self._flush_lock:
+            cutoff_id = discord.utils.time_snowflake(now_tz())
+            # screams buffered since the flush were sent before the cutoff, so they are read from the history
+            for key in [key for key in self.pending if key[0] == guild_id]:
+                del self.pending[key]
+            baseline = select(
+                Screams.guild_id, Screams.user_id, literal(0), literal(0), literal(0), literal(0), Screams.total
+            ).where(Screams.guild_id == guild_id)
+            async with self.bot.session as session, session.begin():
+                await session.execute(delete(ScreamBackfillUser).where(ScreamBackfillUser.guild_id == guild_id))
+                await session.execute(
+                    insert(ScreamBackfillUser).from_select(
+                        ["guild_id", "user_id", "total", "streak", "streak_last", "best_streak", "baseline_total"],
+                        baseline,
+                    )
+                )
+                await session.merge(
+                    ScreamBackfill(
+                        guild_id=guild_id,
+                        channel_id=channel_id,
+                        last_message_id=0,
+                        messages=0,
+                        cutoff_id=cutoff_id,
+                        channel_ids=channel_ids,
+                    )
+                )
+        return cutoff_id
+
+    async def backfill_page(
+        self, guild_id: int, page: list[discord.Message], matcher: ScreamMatcher, messages: int
+    ) -> int:
+        """
+        Count the screams in a page of history and save them along with the checkpoint, as one upsert of the
+        page's users
+
+        :return int: the number of messages read including this page
+        """
+        screams = []
+        for message in page:
+            if message.author.bot:
+                continue
+            match_primary, match_secondary = matcher.match(message.content)
+            if match_primary or match_secondary:
+                screams.append((message.author.id, message.created_at, match_primary))
+        messages += len(page)
+
+        # user id -> (screams, times of their primary screams in order)
+        users: dict[int, tuple[int, list[datetime]]] = {}
+        for uid, created, primary in screams:
+            count, primaries = users.get(uid, (0, []))
+            if primary:
+                primaries.append(created)
+            users[uid] = (count + 1, primaries)
+
+        async with self.bot.session as session, session.begin():
+            # the streaks continue from the stored ones, only users with a primary scream in the page need them
+            streaking = [uid for uid, (_, primaries) in users.items() if primaries]
+            states = {}
+            if streaking:
+                result = await session.execute(
+                    select(ScreamBackfillUser)
+                    .where(ScreamBackfillUser.guild_id == guild_id)
+                    .where(ScreamBackfillUser.user_id.in_(streaking))
+                )
+                states = {user.user_id: user for user in result.scalars()}
+            rows = []
+            for uid, (count, primaries) in users.items():
+                user = ScreamBackfillUser(total=0, streak=0, streak_last=0, best_streak=0)
+                if (state := states.get(uid)) is not None:
+                    for col in backfill_streak_columns:
+                        setattr(user, col, getattr(state, col))
+                for created in primaries:
+                    backfill_scream(user, created, True)
+                row = {col: getattr(user, col) for col in backfill_streak_columns}
+                rows.append(row | {"guild_id": guild_id, "user_id": uid, "total": count, "baseline_total": 0})
+            if rows:
+                stmt = insert(ScreamBackfillUser).values(rows)
+                # users without a primary scream in the page only add to their total
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[ScreamBackfillUser.guild_id, ScreamBackfillUser.user_id],
+                    set_={"total": ScreamBackfillUser.total + stmt.excluded.total}
+                    | {
+                        col: case(
+                            (stmt.excluded.last_day.is_(None), getattr(ScreamBackfillUser, col)),
+                            else_=getattr(stmt.excluded, col),
+                        )
+                        for col in backfill_streak_columns
+                    },
+                )
+                await session.execute(stmt)
+            await session.execute(
+                update(ScreamBackfill)
+                .where(ScreamBackfill.guild_id == guild_id)
+                .values(last_message_id=page[-1].id, messages=messages)
+            )
+        return messages
+
+    async def finish_backfill(self, guild_id: int, cutoff_id: int):
+        """
+        Replace a guild's stats with the backfilled ones, keeping what was counted live after the cutoff, and
+        discard the backfill progress.
+
+        The screams counted live since the cutoff are the users total above their baseline, and the buffered
+        ones are still to be flushed, so totals are added to rather than overwritten. A daily scream after the
+        cutoff continues the backfilled streak.
+        """
+        cutoff = discord.utils.snowflake_time(cutoff_id)
+        backfilled = select(
+            ScreamBackfillUser.guild_id,
+            ScreamBackfillUser.user_id,
+            ScreamBackfillUser.total - ScreamBackfillUser.baseline_total,
+            ScreamBackfillUser.streak,
+            ScreamBackfillUser.streak_last,
+            ScreamBackfillUser.best_streak,
+            func.coalesce(ScreamBackfillUser.daily, epoch()),
+            literal(epoch()),
+        ).where(ScreamBackfillUser.guild_id == guild_id, ScreamBackfillUser.total > 0)
+        stmt = insert(Screams).from_select(
+            ["guild_id", "user_id", "total", "streak", "streak_last", "best_streak", "daily", "streak_keeper"],
+            backfilled,
+        )
+        # values on the right hand side refer to the existing row, which holds the live daily scream if it is
+        # after the cutoff, otherwise the backfilled values are used as they are
+        excluded = stmt.excluded
+        tz = get_tz().zone
+        live_day = cast(func.timezone(tz, Screams.daily), Date)
+        backfilled_day = cast(func.timezone(tz, excluded.daily), Date)
+        live = Screams.daily >= cutoff
+        same_day = live & (live_day == backfilled_day)
+        next_day = live & (live_day == backfilled_day + 1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Screams.guild_id, Screams.user_id],
+            set_={
+                "total": Screams.total + excluded.total,
+                "streak": case((same_day | ~live, excluded.streak), (next_day, excluded.streak + 1), else_=1),
+                "streak_last": case(
+                    (same_day | next_day | ~live, excluded.streak_last),
+                    (excluded.streak > 0, excluded.streak),
+                    else_=excluded.streak_last,
+                ),
+                "best_streak": case(
+                    (same_day | ~live, excluded.best_streak),
+                    (next_day, func.greatest(excluded.best_streak, excluded.streak + 1)),
+                    else_=func.greatest(excluded.best_streak, 1),
+                ),
+                "daily": case((same_day | ~live, excluded.daily), else_=Screams.daily),
+            },
+        )
+        # screams buffered since the cutoff are kept, they are added on the next flush
+        async with self._flush_lock, self.bot.session as session, session.begin():
+            await session.execute(stmt)
+            await session.execute(delete(ScreamBackfillUser).where(ScreamBackfillUser.guild_id == guild_id))
+            await session.execute(delete(ScreamBackfill).where(ScreamBackfill.guild_id == guild_id))
+        self.leaderboards.pop(guild_id, None)
+        self.stats_cache.clear()
 
     # region Listeners & Tasks
 
+    @tasks.loop(seconds=flush_interval)
+    async def flush_screams(self):
+        """
+        Periodically write buffered scream counts to the database
+        """
+        await self.flush()
+        if self.last_counted:
+            cutoff = monotonic() - self.Config.max_dedupe_window
+            self.last_counted = {key: last for key, last in self.last_counted.items() if last > cutoff}
+
+    @tasks.loop(minutes=rollup_interval)
+    async def rollup_screams(self):
+        """
+        Periodically add new scream events to the daily rollup
+        """
+        try:
+            await self.rollup()
+        except Exception as e:
+            self.log.error(f"Failed to roll up scream events: {e}")
+
     @tasks.loop(time=[reset_time])
     async def reset_streak(self):
         """
-        Reset the streaks for all users at the start of the day
+        Reset the streaks for all users in every guild at the start of the day
         """
+        # reset users with lost streaks +3 days old
+        # 3 days gives enough leeway for weird timezone issues
+        three_days = self.today - timedelta(days=3)
+        start = perf_counter()
         async with self.bot.session as session, session.begin():
-            # reset users with lost streaks +3 days old
-            # 3 days gives enough leeway for weird timezone issues
-            three_days = self.today - timedelta(days=3)
-            users = await session.execute(
-                select(Screams).where(Screams.streak > 0).where(Screams.daily < three_days)
+            # a single UPDATE, the partial index on daily where streak > 0 finds the rows in each partition
+            result = await session.execute(
+                update(Screams)
+                .where(Screams.streak > 0)
+                .where(Screams.daily < three_days)
+                .values(streak=0)
+                .returning(Screams.guild_id, Screams.user_id)
+                .execution_options(synchronize_session=False)
             )
-            for user in users:
-                user.streak = 0
-                session.add(user)
-            await session.commit()
-
-    @commands.Cog.listener()
-    @app_commands.guild_only()
-    @commands.bot_has_permissions(manage_roles=True)
-    async def on_message(self, message: discord.Message):
+            reset = result.all()
+        self.log.info(f"Reset {len(reset)} lost streaks in {perf_counter() - start:.3f}s")
+        # everyone's daily scream is now from a previous day
+        self.screamed_today.clear()
+        for guild_id, uid in reset:
+            # guilds without a loaded leaderboard are seeded with the new streaks when it is shown
+            if (leaderboard := self.leaderboards.get(guild_id)) is not None:
+                leaderboard.update(uid, streak=0)
+            self.update_cached(guild_id, uid, streak=0)
+
+    async def on_scream(self, message: discord.Message):
         """
-        Listen for messages in the configured channel and update the statistics
+        Update the statistics for a message in a scream channel, only messages in the channels routed
+        with `route` reach this
 
         :param discord.Message message: The message object
         """
         # don't respond to bots
         if message.author.bot:
             return
-        # check if the message is in the configured channel
-        config = self.bot.modules[cog_name].get(message.guild.id)
-        if config is None:
+        config = await self.configs.get(message.guild.id)
+        # a channel removed while its messages were being dispatched
+        if message.channel.id not in config.channel_ids:
             return
-        if message.channel == config.channel:
-            msg, author = message.content, message.author
-            # match the message against the primary and secondary regex
-            try:
-                match_primary = config.regexp_primary.search(msg)
-                match_secondary = config.regexp_secondary.search(msg)
-                if match_primary or match_secondary:
-                    async with self.bot.session as session, session.begin():
-                        user = await session.get(Screams, author.id)
-                        if user is None:
-                            user = Screams(
-                                user_id=author.id,
-                                total=0,
-                                streak=0,
-                                streak_last=0,
-                                best_streak=0,
-                                daily=epoch(),
-                                streak_keeper=epoch(),
-                            )
-                        user.total += 1
-
-                        today = self.today
-                        streak = 0
-                        if user.daily < today and match_primary:
-                            yesterday = today - timedelta(days=1)
-                            if user.daily > yesterday:
-                                streak = user.streak
-                            else:
-                                user.streak_last = user.streak
-
-                            streak += 1
-                            if streak > user.best_streak:
-                                user.best_streak = streak
-                            user.streak = streak
-                            user.daily = now_tz()
-
-                            await message.channel.send(
-                                f"Congrats {author.mention} on your first scream of the day.\nYour current streak is: {streak}."
-                            )
-
-                            if streak % 100 == 0:
-                                await message.channel.send(
-                                    "https://i.guim.co.uk/img/media/8a840f693b91fe67d42555b24c6334e9298f4680/251_1497_2178_1306/master/2178.jpg?width=1200&height=900&quality=85&auto=format&fit=crop&s=9ff658ed0e9b905fa583c592cc2342f5"
-                                )
-                                await message.channel.send(f"Congrats on reaching {streak}!")
-
-                            if streak == config.minor_threshold and config.minor_role is not None:
-                                await author.add_roles(config.minor_role)
-                            if streak == config.major_threshold and config.major_role is not None:
-                                await author.add_roles(config.major_role)
-                        session.add(user)
-                        await session.commit()
-            except Exception as e:
-                self.log.info(e)
+        msg, author = message.content, message.author
+        key = (message.guild.id, author.id)
+        # match the message against the primary and secondary regex
+        try:
+            matcher = config.matcher
+            if matcher.prefiltered:
+                match_primary, match_secondary = matcher.match(msg)
+            else:
+                match_primary = matcher.primary.search(msg, 0, MAX_SCAN_LENGTH)
+                match_secondary = matcher.secondary.search(msg, 0, MAX_SCAN_LENGTH)
+            # anything that waits on the database or discord runs on the ingest workers
+            if match_primary and not self.has_screamed_today(*key):
+                # the first scream of the day is never coalesced, it keeps the streak going, but starts a window
+                if config.dedupe_window:
+                    self.last_counted[key] = monotonic()
+                self.ingest.put(partial(self.ingest_daily, message, config))
+            elif match_primary or match_secondary:
+                if config.dedupe_window and self.is_burst(key, config.dedupe_window):
+                    self.suppressed += 1
+                    return
+                self.pending[key] = self.pending.get(key, 0) + 1
+                self.log_event(message)
+            if (len(self.pending) >= flush_threshold or len(self.events) >= event_threshold) and not self._flush_queued:
+                self._flush_queued = self.ingest.put(self.flush)
+        except Exception as e:
+            self.log.info(e)
+
+    def is_burst(self, key: tuple[int, int], window: float) -> bool:
+        """
+        Check if a scream is part of a burst that was already counted, otherwise start a new window from it
+
+        :param key: (guild id, user id)
+        :param window: the guild's dedupe window in seconds
+        :return bool: True if the user had a scream counted less than `window` seconds ago
+        """
+        now = monotonic()
+        last = self.last_counted.get(key)
+        if last is not None and now - last < window:
+            return True
+        self.last_counted[key] = now
+        return False
+
+    async def ingest_daily(self, message: discord.Message, config: Config):
+        """
+        Record a primary scream from a user who hadn't screamed yet today, run by the ingest workers
+
+        :param discord.Message message: The message object
+        :param Config config: the guild config
+        """
+        key = (message.guild.id, message.author.id)
+        daily = await self.record_daily(message, config, self.pending.pop(key, 0))
+        self.log_event(message, daily)
 
     # endregion
     # region Embeds / Helpers
 
-    async def has_screamed(self, uid, name="User") -> str:
-        row = await self.get_screams(uid)
+    async def has_screamed(self, guild_id, uid, name="User") -> str:
+        row = await self.get_screams(guild_id, uid)
         if row is None:
             return f"{name} has not done any screaming yet."
         if row.daily < self.today:
@@ -248,47 +1259,95 @@ class statistics(commands.Cog):
 
         return f"They {msg} screamed today."
 
-    async def get_user(self, aid):
-        class UnknownUser:
-            def __init__(self) -> None:
-                self.display_name = "[Unknown]"
-
-            def __str__(self) -> str:
-                return self.display_name
-
-        try:
-            user = await self.bot.fetch_user(aid)
-            user = UnknownUser() if user is None else user
-        except discord.errors.NotFound:
-            user = UnknownUser()
-        return user
-
     async def embed_user_stats(self, user: discord.Member) -> discord.Embed:
         uid = user.id
         name = user.display_name
         avatar = user.display_avatar
 
-        row = await self.get_screams(uid)
+        row = await self.get_screams(user.guild.id, uid)
         embed = discord.Embed(title="Scream Statistics", description="")
         embed.set_author(name=f"{name}")
         embed.set_thumbnail(url=f"{avatar}")
         if row is not None:
-            embed.add_field(name="Total Screams", value=f"{row.total}")
+            embed.add_field(name="Total Screams", value=f"{row.total + self.pending.get((user.guild.id, uid), 0)}")
             embed.add_field(name="Scream Streak", value=f"{row.streak}")
             embed.add_field(name="Best Scream Streak", value=f"{row.best_streak}")
         else:
             embed.add_field(name="", value="No screams as of yet.")
         return embed
 
-    async def embed_leaderboad(self) -> discord.Embed:
-        top = 5
+    async def query_leaderboard(self, guild_id: int, *cols: str) -> dict[str, list]:
+        """
+        Rank a guild's users by the given leaderboard columns in the database, in a single statement
 
-        async def build_message(rows):
+        :param guild_id: the guild id
+        :param cols: the column names, see Leaderboard.columns
+        :return: the column name -> the top rows with the user_id, col and rank
+        """
+        async with self.bot.session as session:
+            result = (await session.execute(leaderboard_query(guild_id, cols, leaderboard_top, with_ties=True))).all()
+        return {col: [row for row in result if row.name == col] for col in cols}
+
+    async def leaderboard_rows(self, guild_id: int) -> dict[str, list]:
+        """
+        A guild's top rows for each leaderboard column, from the in memory index where possible
+
+        :param guild_id: the guild id
+        :return: the column name -> the top rows with the user_id, col and rank
+        """
+        leaderboard = self.leaderboard_for(guild_id)
+        stale = [col for col in Leaderboard.columns if not leaderboard[col].valid]
+        if stale:
+            # not loaded yet or too many of the tracked users dropped out, reload them
+            await self.seed_leaderboard(guild_id, *stale)
+        rows = {col: leaderboard[col].top() for col in Leaderboard.columns if leaderboard[col].valid}
+        # ties at the bound, the untracked users could still be in the top
+        missing = [col for col in Leaderboard.columns if col not in rows]
+        if missing:
+            rows.update(await self.query_leaderboard(guild_id, *missing))
+        return rows
+
+    async def user_rank(self, guild_id: int, uid: int) -> dict[str, tuple[int, int]] | None:
+        """
+        Get a user's rank in a guild for each leaderboard column, from the leaderboard index if the user is in it
+
+        :param guild_id: the guild id
+        :param uid: the user id
+        :return: the column name -> (value, rank), or None if the user has no stats
+        """
+        leaderboard = self.leaderboard_for(guild_id)
+        ranks = {col: (leaderboard[col].value(uid), leaderboard[col].rank(uid)) for col in Leaderboard.columns}
+        if all(rank is not None for _, rank in ranks.values()):
+            return ranks
+        async with self.bot.session as session:
+            row = (await session.execute(rank_query(guild_id, uid))).one_or_none()
+        if row is None:
+            return None
+        return {col: (getattr(row, col), getattr(row, f"{col}_rank")) for col in Leaderboard.columns}
+
+    async def embed_user_rank(self, user: discord.Member) -> discord.Embed:
+        ranks = await self.user_rank(user.guild.id, user.id)
+        embed = discord.Embed(title="Scream Rank", description="")
+        embed.set_author(name=f"{user.display_name}")
+        embed.set_thumbnail(url=f"{user.display_avatar}")
+        if ranks is not None:
+            names = {"total": "Total Screams", "streak": "Scream Streak", "best_streak": "Best Scream Streak"}
+            for col, (value, rank) in ranks.items():
+                embed.add_field(name=names[col], value=f"#{rank} with {value}")
+        else:
+            embed.add_field(name="", value="No screams as of yet.")
+        return embed
+
+    async def embed_leaderboad(self, guild: discord.Guild) -> discord.Embed:
+        top = leaderboard_top
+
+        def build_message(rows, names):
             """
-            Generate the top 5 message from the set of rows returned from the database
+            Generate the top 5 message from the set of leaderboard rows
 
-            :param _type_ rows: _description_
-            :return _type_: _description_
+            :param rows: the rows with the user_id, col and rank
+            :param names: user id -> display name
+            :return str: the message
             """
 
             emoji = {1: ":one:", 2: ":two:", 3: ":three:", 4: ":four:", 5: ":five:"}
@@ -296,8 +1355,7 @@ class statistics(commands.Cog):
             message = ""
             count = 0
             for row in rows:
-                user = await self.get_user(row.user_id)
-                message += f"{emoji[row.rank]}\u27F6 {user.display_name} with {row.col} screams.\n"
+                message += f"{emoji[row.rank]}\u27F6 {names[row.user_id]} with {row.col} screams.\n"
                 count += 1
             for i in range(count, top):
                 message += f"{emoji[i+1]}\u27F6 This could be you!\n"
@@ -308,30 +1366,27 @@ class statistics(commands.Cog):
         embed = discord.Embed(title=f"{header}", description="The top screamers", color=discord.Color.darker_grey())
         embed.set_thumbnail(url="https://cdn.discordapp.com/emojis/1043839508887634010.webp?size=96&quality=lossless")
 
-        async with self.bot.session as session:
-            cols = [Screams.total, Screams.streak, Screams.best_streak]
-            subqs = [
-                (
-                    select(Screams.user_id, col.label("col"), func.rank().over(order_by=col.desc()).label("rank"))
-                ).subquery()
-                for col in cols
-            ]
-            stmts = [select(subq).where(subq.c.rank <= top) for subq in subqs]
+        rows = await self.leaderboard_rows(guild.id)
 
-            bestTotal = await session.execute(stmts[0])
+        bestTotal = rows["total"]
 
-            bestStreak = await session.execute(stmts[1])
+        bestStreak = rows["streak"]
 
-            bestStreakHistorical = await session.execute(stmts[2])
+        bestStreakHistorical = rows["best_streak"]
+
+        # resolve every name up front so only the uncached users are fetched, concurrently
+        names = await self.bot.names.resolve_many(
+            (row.user_id for row in (*bestTotal, *bestStreak, *bestStreakHistorical)), guild
+        )
 
         embed.add_field(
-            name="__Total Number of times screamed__", value=f"{await build_message(bestTotal)}", inline=False
+            name="__Total Number of times screamed__", value=f"{build_message(bestTotal, names)}", inline=False
         )
 
-        embed.add_field(name="__Best active daily streak__", value=f"{await build_message(bestStreak)}", inline=False)
+        embed.add_field(name="__Best active daily streak__", value=f"{build_message(bestStreak, names)}", inline=False)
 
         embed.add_field(
-            name="__Best historical daily streak__", value=f"{await build_message(bestStreakHistorical)}", inline=False
+            name="__Best historical daily streak__", value=f"{build_message(bestStreakHistorical, names)}", inline=False
         )
         return embed
 
@@ -363,7 +1418,7 @@ class statistics(commands.Cog):
         if user is None:
             user = interaction.user
         uid = user.id
-        msg = await self.has_screamed(uid)
+        msg = await self.has_screamed(interaction.guild.id, uid)
         await interaction.followup.send(msg, ephemeral=False)
 
     @commands.command(name="didiscream", description="Check if this user has screamed yet today")
@@ -372,7 +1427,7 @@ class statistics(commands.Cog):
         if user is None:
             user = ctx.author
         uid = user.id
-        msg = await self.has_screamed(uid)
+        msg = await self.has_screamed(ctx.guild.id, uid)
         await ctx.send(msg)
 
     @stats_group.command(description="Get the top void screamers in the server.")
@@ -381,7 +1436,9 @@ class statistics(commands.Cog):
     async def leaderboard(self, interaction: discord.Interaction):
         now = round(datetime.timestamp(now_tz()))
         await interaction.response.send_message(f"Leaderboard Loading... since <t:{now}:R>", ephemeral=False)
-        await (await interaction.original_response()).edit(content="", embed=await self.embed_leaderboad())
+        await (await interaction.original_response()).edit(
+            content="", embed=await self.embed_leaderboad(interaction.guild)
+        )
 
     @commands.command(
         name="leaderboard",
@@ -391,7 +1448,22 @@ class statistics(commands.Cog):
     @commands.cooldown(1, 5.0, type=commands.BucketType.user)
     @commands.guild_only()
     async def text_leaderboard(self, ctx: commands.Context):
-        await ctx.send(embed=await self.embed_leaderboad())
+        await ctx.send(embed=await self.embed_leaderboad(ctx.guild))
+
+    @stats_group.command(name="rank", description="Get where a user ranks in the server.")
+    @app_commands.guild_only()
+    async def app_rank(self, interaction: discord.Interaction, user: Optional[discord.Member] = None):
+        await interaction.response.defer()
+        if user is None:
+            user = interaction.user
+        await interaction.followup.send(embed=await self.embed_user_rank(user), ephemeral=False)
+
+    @commands.command(name="rank", description="Get where a user ranks in the server.")
+    @commands.guild_only()
+    async def text_rank(self, ctx: commands.Context, user: Optional[discord.Member] = None):
+        if user is None:
+            user = ctx.author
+        await ctx.send(embed=await self.embed_user_rank(user))
 
     # endregion
     # region App Only Commands
@@ -415,7 +1487,7 @@ class statistics(commands.Cog):
             )
             return
         user = interaction.user
-        row = await self.get_screams(user.id)
+        row = await self.get_screams(interaction.guild.id, user.id)
         if row is None:
             await interaction.followup.send(
                 f"{user.display_name} has no stats to save.",
@@ -458,12 +1530,26 @@ class statistics(commands.Cog):
                 ephemeral=True,
             )
             return
+        # the cached row can be older than the database, so the save is written and re-checked in the database
         async with self.bot.session as session:
-            row.streak_keeper = today
-            row.streak = row.streak_last - 30
-            row.streak_last = 0
-            session.add(row)
+            streak = await session.scalar(
+                update(Screams)
+                .where(Screams.guild_id == interaction.guild.id, Screams.user_id == user.id)
+                .where(Screams.daily <= yesterday, Screams.daily >= seven_days_ago)
+                .where(Screams.streak_keeper <= six_months_ago, Screams.streak_last >= 30)
+                .values(streak_keeper=today, streak=Screams.streak_last - 30, streak_last=0)
+                .returning(Screams.streak)
+                .execution_options(synchronize_session=False)
+            )
             await session.commit()
+        self.stats_cache.pop((interaction.guild.id, user.id))
+        if streak is None:
+            await interaction.followup.send(
+                "Your stats changed while saving your streak, check if it can still be saved",
+                ephemeral=True,
+            )
+            return
+        self.leaderboard_for(interaction.guild.id).update(user.id, streak=streak)
         await interaction.followup.send(
             "Your streak has been saved, you lost 30 days but kept the streak.",
             ephemeral=True,
@@ -485,7 +1571,7 @@ class statistics(commands.Cog):
         await interaction.response.defer(ephemeral=True)
 
         async with self.bot.session as session:
-            row = await session.get(Screams, user.id)
+            row = await session.get(Screams, (interaction.guild.id, user.id))
             if row is None:
                 await interaction.followup.send(f"{user.display_name} has no stats to override.", ephemeral=True)
                 return
@@ -497,10 +1583,103 @@ class statistics(commands.Cog):
                 row.best_streak = best_streak
             if set_daily_today:
                 row.daily = now_tz()
+            values = {"total": row.total, "streak": row.streak, "best_streak": row.best_streak}
             session.add(row)
             await session.commit()
+        self.stats_cache.pop((interaction.guild.id, user.id))
+        self.leaderboard_for(interaction.guild.id).update(user.id, **values)
         await interaction.followup.send(f"Updated {user.display_name}'s stats.", ephemeral=True)
 
+    @stats_group.command(name="history", description="Show how much the server has screamed each day.")
+    @app_commands.describe(days="The number of days to show, including today")
+    @app_commands.guild_only()
+    async def history(self, interaction: discord.Interaction, days: app_commands.Range[int, 1, history_max_days] = 14):
+        await interaction.response.defer()
+        today = now_tz().date()
+        since = today - timedelta(days=days - 1)
+        # only the rollup is read, one row per day no matter how many screams there were
+        async with self.bot.session as session:
+            result = await session.execute(
+                select(ScreamDaily).where(ScreamDaily.guild_id == interaction.guild.id).where(ScreamDaily.day >= since)
+            )
+            rollup = {row.day: row for row in result.scalars()}
+
+        message = ""
+        for i in range(days):
+            day = since + timedelta(days=i)
+            row = rollup.get(day)
+            if row is None:
+                message += f"`{day}` no screams\n"
+            else:
+                message += f"`{day}` {row.screams} screams from {row.screamers} screamers\n"
+        embed = discord.Embed(title="Scream History", description=message, color=discord.Color.darker_grey())
+        embed.set_footer(text=f"Updated every {rollup_interval} minutes")
+        await interaction.followup.send(embed=embed)
+
+    @stats_group.command(name="backfill", description="Rebuild the scream statistics from the scream channels.")
+    @app_commands.describe(restart="Start over instead of resuming an interrupted backfill")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.guild_only()
+    async def app_backfill(self, interaction: discord.Interaction, restart: bool = False):
+        guild = interaction.guild
+        config = await self.configs.get(guild.id)
+        if not isinstance(config.channel, discord.TextChannel):
+            await interaction.response.send_message("The scream channel has not been set up.", ephemeral=True)
+            return
+        # every channel screams are counted in is read, the totals would lose the screams of any left out
+        channels = [config.channel]
+        for channel_id in config.channel_ids - {config.channel.id}:
+            channel = guild.get_channel_or_thread(channel_id)
+            if not isinstance(channel, discord.abc.Messageable):
+                await interaction.response.send_message(
+                    f"Could not read the scream channel <#{channel_id}>, remove it with /setup screamchannels.",
+                    ephemeral=True,
+                )
+                return
+            channels.append(channel)
+        if guild.id in self.backfills:
+            await interaction.response.send_message("A backfill is already running.", ephemeral=True)
+            return
+        await interaction.response.send_message(
+            f"Backfilling the scream statistics from {', '.join(c.mention for c in channels)}, this can take a while.",
+            ephemeral=True,
+        )
+        task = self.backfills[guild.id] = asyncio.create_task(self.backfill(guild, channels, restart))
+        try:
+            messages = await task
+        except asyncio.CancelledError:
+            self.log.info(f"Scream backfill for guild {guild.id} was interrupted")
+            raise
+        except Exception as e:
+            self.log.error(f"Scream backfill for guild {guild.id} failed: {e}")
+            await interaction.channel.send("The scream backfill failed, run it again to resume it.")
+        else:
+            await interaction.channel.send(f"Rebuilt the scream statistics from {messages} messages.")
+        finally:
+            self.backfills.pop(guild.id, None)
+
+    @stats_group.command(name="metrics", description="Show the user stats cache and scream queue metrics.")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.guild_only()
+    async def metrics(self, interaction: discord.Interaction):
+        cache = self.stats_cache
+        lookups = cache.hits + cache.misses
+        rate = cache.hits / lookups if lookups else 0
+        ingest = self.ingest
+        configs = self.configs
+        await interaction.response.send_message(
+            f"User stats cache: {len(cache)}/{cache.maxsize} entries, {cache.hits} hits, "
+            f"{cache.misses} misses ({rate:.1%} hit rate).\n"
+            f"Guild configs: {len(configs)}/{configs.maxsize} loaded, {configs.misses} loads.\n"
+            f"Outbox: {self.outbox_delivered} delivered, {self.outbox_retried} retried, "
+            f"{self.outbox_dropped} dropped.\n"
+            f"Dedupe: {self.suppressed} screams in bursts not counted, {len(self.last_counted)} users tracked.\n"
+            f"Scream queue: {ingest.depth} waiting (peak {ingest.high_water}, limit {ingest.maxsize} + "
+            f"{ingest.spill_size} overflow), {ingest.processed} done, {ingest.failed} failed, "
+            f"{ingest.spilled} spilled, {ingest.dropped} dropped.",
+            ephemeral=True,
+        )
+
     # region Menus
 
     @app_commands.guild_only()
@@ -513,7 +1692,7 @@ class statistics(commands.Cog):
     async def didiscream_menu(self, interaction: discord.Interaction, user: discord.Member) -> None:
         await interaction.response.defer(ephemeral=True)
         uid = user.id
-        msg = await self.has_screamed(uid)
+        msg = await self.has_screamed(interaction.guild.id, uid)
         msg = await interaction.followup.send(content=msg, ephemeral=True, wait=True)
         await msg.delete(delay=120)
 
@@ -1,19 +1,34 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
-from sqlalchemy import BigInteger, DateTime, ForeignKeyConstraint, Identity
+from sqlalchemy import ARRAY, BigInteger, Date, DateTime, ForeignKeyConstraint, Identity, Index, event, text
 from sqlalchemy.orm import Mapped, backref, mapped_column, relationship
 
 from bot.database import Base
 
 # statistics.py
 
+# number of hash partitions the screams table is split into by guild
+SCREAMS_PARTITIONS = 8
+
+
 class Screams(Base):
     __tablename__ = "screams"
+    __table_args__ = (
+        # the leaderboard columns are indexed per guild so the top users are read without sorting the table
+        Index("ix_screams_guild_total", "guild_id", "total"),
+        Index("ix_screams_guild_streak", "guild_id", "streak"),
+        Index("ix_screams_guild_best_streak", "guild_id", "best_streak"),
+        # only users with an active streak are checked by the nightly reset
+        Index("ix_screams_daily_streaking", "daily", postgresql_where=text("streak > 0")),
+        {"postgresql_partition_by": "HASH (guild_id)"},
+    )
+
+    guild_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     total: Mapped[int]
     streak: Mapped[int]
-    streak_last = Mapped[int]
+    streak_last: Mapped[int]
     best_streak: Mapped[int]
     daily: Mapped[datetime] = mapped_column(DateTime(timezone=True))
     streak_keeper: Mapped[datetime] = mapped_column(DateTime(timezone=True))
@@ -21,6 +36,7 @@ class Screams(Base):
     def __repr__(self):
         return (
             f"<Screams("
+            f"guild_id={self.guild_id},"
             f"user_id={self.user_id},"
             f"total={self.total},"
             f"streak={self.streak},"
@@ -31,6 +47,135 @@ class Screams(Base):
         )
 
 
+@event.listens_for(Screams.__table__, "after_create")
+def create_screams_partitions(target, connection, **kw):
+    """
+    A partitioned table can't hold rows itself, create its partitions along with it
+    """
+    for remainder in range(SCREAMS_PARTITIONS):
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {target.name}_p{remainder} PARTITION OF {target.name} "
+                f"FOR VALUES WITH (MODULUS {SCREAMS_PARTITIONS}, REMAINDER {remainder})"
+            )
+        )
+
+
+class ScreamEvent(Base):
+    """
+    Every counted scream, the table is only ever appended to
+    """
+
+    __tablename__ = "scream_events"
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    guild_id: Mapped[int] = mapped_column(BigInteger)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    created: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    # the users first scream of the day, which continued their streak
+    daily: Mapped[bool]
+
+    def __repr__(self):
+        return (
+            f"<ScreamEvent("
+            f"id={self.id},"
+            f"guild_id={self.guild_id},"
+            f"user_id={self.user_id},"
+            f"created={self.created},"
+            f"daily={self.daily}"
+            ")>"
+        )
+
+
+class ScreamDaily(Base):
+    """
+    The scream events of a guild rolled up per day
+    """
+
+    __tablename__ = "scream_daily"
+    guild_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    screams: Mapped[int]
+    # users who screamed that day, each user has one daily scream per day
+    screamers: Mapped[int]
+
+    def __repr__(self):
+        return (
+            f"<ScreamDaily("
+            f"guild_id={self.guild_id},"
+            f"day={self.day},"
+            f"screams={self.screams},"
+            f"screamers={self.screamers}"
+            ")>"
+        )
+
+
+class RollupState(Base):
+    """
+    The last event included in a rollup
+    """
+
+    __tablename__ = "rollup_state"
+    name: Mapped[str] = mapped_column(primary_key=True)
+    last_id: Mapped[int] = mapped_column(BigInteger)
+
+
+class ScreamBackfill(Base):
+    """
+    Progress of a guild's scream history backfill, so an interrupted backfill can resume
+    """
+
+    __tablename__ = "scream_backfill"
+    guild_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    channel_id: Mapped[int] = mapped_column(BigInteger)
+    # the newest message processed, history is read oldest first in snowflake order across the channels
+    last_message_id: Mapped[int] = mapped_column(BigInteger)
+    messages: Mapped[int]
+    # history is read up to this snowflake, later screams are counted live and added to the backfilled stats
+    cutoff_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    # every channel screams were counted in when the backfill started, their histories are read as one
+    channel_ids: Mapped[Optional[list[int]]] = mapped_column(ARRAY(BigInteger))
+
+
+class ScreamBackfillUser(Base):
+    """
+    The stats computed so far by a backfill, copied into screams once the backfill finishes
+    """
+
+    __tablename__ = "scream_backfill_users"
+    guild_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    total: Mapped[int]
+    streak: Mapped[int]
+    streak_last: Mapped[int]
+    best_streak: Mapped[int]
+    # the local day and time of the users last daily scream
+    last_day: Mapped[Optional[date]] = mapped_column(Date)
+    daily: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    # the users total in screams at the cutoff, anything above it was counted live after the cutoff
+    baseline_total: Mapped[int] = mapped_column(default=0)
+
+
+class ScreamOutbox(Base):
+    """
+    Discord side effects of screams, congratulation messages and roles, written in the same transaction as the
+    scream and delivered after it commits
+    """
+
+    __tablename__ = "scream_outbox"
+    __table_args__ = (Index("ix_scream_outbox_not_before", "not_before"),)
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    guild_id: Mapped[int] = mapped_column(BigInteger)
+    # "send" a message to the channel or "add_role" to the user
+    action: Mapped[str]
+    channel_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    user_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    role_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    content: Mapped[Optional[str]]
+    attempts: Mapped[int] = mapped_column(default=0)
+    # not delivered before this time, pushed back after a failed attempt
+    not_before: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
 class StatisticsConfig(Base):
     __tablename__ = "statistics_config"
     guild_id = mapped_column(BigInteger, primary_key=True)
@@ -41,12 +186,29 @@ class StatisticsConfig(Base):
     major_threshold: Mapped[Optional[int]]
     minor_role_id: Mapped[Optional[int]] = mapped_column(BigInteger)
     major_role_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    dedupe_window: Mapped[Optional[int]]
+
+
+class StatisticsChannel(Base):
+    """
+    Additional channels screams are counted in, besides the channel in statistics_config
+    """
+
+    __tablename__ = "statistics_channels"
+    guild_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    channel_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
 
 
 # reminder.py
 
 class Reminder(Base):
     __tablename__ = "reminders"
+    __table_args__ = (
+        # due one off reminders are read in (send_time, id) order
+        Index("ix_reminders_due", "send_time", "id", postgresql_where=text("NOT repeat")),
+        # a user's reminders are listed by send time
+        Index("ix_reminders_user_send_time", "user_id", "send_time"),
+    )
     id: Mapped[int] = mapped_column(Identity(start=1, cycle=True), primary_key=True)
     user_id: Mapped[int] = mapped_column(BigInteger)
     channel_id: Mapped[int] = mapped_column(BigInteger)
@@ -54,6 +216,9 @@ class Reminder(Base):
     send_time: Mapped[datetime] = mapped_column(DateTime(timezone=True))
     requested_time: Mapped[datetime] = mapped_column(DateTime(timezone=True))
     repeat: Mapped[bool]
+    # the worker sending the reminder, no other worker claims it before claimed_until
+    claimed_by: Mapped[Optional[str]]
+    claimed_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
 
     def __repr__(self):
         return (
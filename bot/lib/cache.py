@@ -0,0 +1,98 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_missing = object()
+
+
+class TTLCache(Generic[K, V]):
+    """
+    A least recently used cache whose entries expire `ttl` seconds after they were set.
+
+    Once `maxsize` entries are stored the least recently used entry is evicted.
+    Expired entries are dropped when they are looked up or reach the end of the LRU order.
+    Lookups with `get` are counted in `hits` and `misses`.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expiry time, value), least recently used first
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return self._lookup(key) is not _missing
+
+    def get(self, key: K, default=None):
+        """
+        Look up a key and mark it as recently used
+
+        :param key: the key
+        :param default: returned if the key is missing or expired
+        :return: the cached value or the default
+        """
+        value = self._lookup(key)
+        if value is _missing:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def _lookup(self, key: K):
+        entry = self._data.get(key)
+        if entry is None:
+            return _missing
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self._data[key]
+            return _missing
+        self._data.move_to_end(key)
+        return value
+
+    def peek(self, key: K, default=None):
+        """
+        Look up a key without counting the lookup or changing the LRU order, e.g. to update a cached value
+
+        :param key: the key
+        :param default: returned if the key is missing or expired
+        :return: the cached value or the default
+        """
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return default
+        return entry[1]
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        """
+        Store a value, evicting the least recently used entry if the cache is full
+
+        :param key: the key
+        :param value: the value
+        :param ttl: the time to live in seconds, defaults to the cache's ttl
+        """
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K, default=None):
+        """
+        Remove a key
+
+        :param key: the key
+        :param default: returned if the key is missing
+        :return: the removed value or the default
+        """
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
@@ -0,0 +1,37 @@
+import discord
+
+
+async def get_guild(client: discord.Client, guild_id: int) -> discord.Guild | None:
+    """
+    Get a guild from the gateway cache, only fetching it if it is not cached
+
+    :param client: the client
+    :param guild_id: the guild id
+    :return: the guild or None if it could not be found
+    """
+    guild = client.get_guild(guild_id)
+    if guild is not None:
+        return guild
+    try:
+        return await client.fetch_guild(guild_id)
+    except discord.NotFound:
+        return None
+
+
+async def get_channel(guild: discord.Guild, channel_id: int | None) -> discord.abc.GuildChannel | None:
+    """
+    Get a guild channel from the gateway cache, only fetching it if it is not cached
+
+    :param guild: the guild
+    :param channel_id: the channel id
+    :return: the channel or None if it could not be found
+    """
+    if channel_id is None:
+        return None
+    channel = guild.get_channel(channel_id)
+    if channel is not None:
+        return channel
+    try:
+        return await guild.fetch_channel(channel_id)
+    except discord.NotFound:
+        return None
@@ -0,0 +1,160 @@
+from bisect import bisect_left, insort
+from typing import Iterable, NamedTuple
+
+
+class LeaderboardRow(NamedTuple):
+    user_id: int
+    col: int
+    rank: int
+
+
+class TopK:
+    """
+    Keep the users with the highest values for one column, ordered by value.
+
+    More than `k` users are tracked so that users dropping out of the top `k` can be replaced
+    without going back to the database. Every untracked user is known to have a value of at most `bound`.
+    Lookups are a binary search over at most `capacity` entries.
+    """
+
+    def __init__(self, k: int, capacity: int | None = None) -> None:
+        self.k = k
+        self.capacity = capacity if capacity is not None else k * 4
+        # (-value, user id) so the list is sorted with the highest value first
+        self._entries: list[tuple[int, int]] = []
+        self._values: dict[int, int] = {}
+        self.bound: int | None = None
+        self.seeded = False
+
+    def seed(self, rows: Iterable[tuple[int, int]]) -> None:
+        """
+        Replace the index with the top rows from the database.
+
+        :param rows: (user id, value) pairs, at most `capacity` of them ordered by value descending
+        """
+        self._entries = sorted((-value, uid) for uid, value in rows)
+        self._values = {uid: -neg for neg, uid in self._entries}
+        # if there were fewer rows than the capacity every user is tracked
+        self.bound = -self._entries[-1][0] if len(self._entries) >= self.capacity else None
+        self.seeded = True
+
+    @property
+    def valid(self) -> bool:
+        """
+        True if the top `k` users are known without going back to the database.
+        Untracked users may tie with the bound, so the `k`th value has to be above it.
+        """
+        if not self.seeded:
+            return False
+        return self.bound is None or (len(self._entries) >= self.k and -self._entries[self.k - 1][0] > self.bound)
+
+    def update(self, uid: int, value: int) -> None:
+        """
+        Record a new value for a user
+
+        :param uid: the user id
+        :param value: the users new value
+        """
+        old = self._values.pop(uid, None)
+        if old is not None:
+            del self._entries[bisect_left(self._entries, (-old, uid))]
+        if self.bound is not None and value < self.bound:
+            # the user is below (or dropped below) users that are not tracked
+            return
+        insort(self._entries, (-value, uid))
+        self._values[uid] = value
+        if len(self._entries) > self.capacity:
+            neg, evicted = self._entries.pop()
+            del self._values[evicted]
+            self.bound = -neg if self.bound is None else max(self.bound, -neg)
+
+    def value(self, uid: int) -> int | None:
+        """
+        The value of a tracked user, or None if the user is not tracked
+        """
+        return self._values.get(uid)
+
+    def rank(self, uid: int) -> int | None:
+        """
+        The rank of a tracked user, users with an equal value share a rank.
+        Untracked users are never above a tracked one, so only the tracked users have to be counted.
+
+        :param uid: the user id
+        :return: the rank or None if the user is not tracked
+        """
+        value = self._values.get(uid) if self.seeded else None
+        if value is None:
+            return None
+        # the position of the first entry with this value
+        return bisect_left(self._entries, (-value, -1)) + 1
+
+    def top(self) -> list[LeaderboardRow]:
+        """
+        The top `k` users ranked like SQL's rank(): equal values share a rank, so more than `k` rows
+        may be returned when there is a tie for the last place.
+        """
+        rows = []
+        for i, (neg, uid) in enumerate(self._entries):
+            rank = i + 1 if not rows or rows[-1].col != -neg else rows[-1].rank
+            if rank > self.k:
+                break
+            rows.append(LeaderboardRow(uid, -neg, rank))
+        return rows
+
+
+class Leaderboard:
+    """
+    A top `k` index for each of the ranked columns.
+    """
+
+    columns = ("total", "streak", "best_streak")
+
+    def __init__(self, k: int) -> None:
+        self.k = k
+        self.boards = {col: TopK(k) for col in self.columns}
+        # the updates made while seeds are read from the database, (column, user id) -> the latest value
+        self._recordings: list[dict[tuple[str, int], int]] = []
+
+    def __getitem__(self, col: str) -> TopK:
+        return self.boards[col]
+
+    def update(self, uid: int, **values: int) -> None:
+        """
+        Record new values for a user, e.g. update(uid, total=10, streak=2)
+        """
+        for col, value in values.items():
+            self.boards[col].update(uid, value)
+            for updates in self._recordings:
+                updates[col, uid] = value
+
+    def record(self) -> dict[tuple[str, int], int]:
+        """
+        Start recording updates, to replay them over a seed read from the database meanwhile.
+        Stop the recording with `stop` once the seed is read.
+
+        :return: the recorded updates, (column, user id) -> the latest value
+        """
+        updates = {}
+        self._recordings.append(updates)
+        return updates
+
+    def stop(self, updates: dict[tuple[str, int], int]) -> None:
+        """
+        Stop a recording started with `record`
+        """
+        self._recordings = [recording for recording in self._recordings if recording is not updates]
+
+    def seed(self, col: str, rows: Iterable[tuple[int, int]], updates: dict[tuple[str, int], int]) -> None:
+        """
+        Replace the index for a column with rows from the database, then replay the updates recorded while they
+        were read, which the rows may not include yet
+
+        :param col: the column name
+        :param rows: (user id, value) pairs, see TopK.seed
+        :param updates: the updates recorded while the rows were read
+        """
+        board = self.boards[col]
+        board.seed(rows)
+        for (updated, uid), value in updates.items():
+            if updated == col:
+                board.update(uid, value)
@@ -0,0 +1,50 @@
+import os
+import socket
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, select, update
+
+# identifies this process to the other workers sharing a table
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claimable(model, now: datetime):
+    """
+    :param model: a mapped class with `claimed_by` and `claimed_until` columns
+    :param now: the current time
+    :return: the criterion for rows no worker holds a lease on, including leases of workers that crashed
+    """
+    return or_(model.claimed_until.is_(None), model.claimed_until <= now)
+
+
+def claim(model, *criteria, now: datetime, lease: float, order_by=(), limit: int | None = None, worker=WORKER_ID):
+    """
+    Build a statement leasing the matching rows to a worker for `lease` seconds, returning the claimed rows.
+
+    The rows are picked with SELECT ... FOR UPDATE SKIP LOCKED so concurrent claims never wait on or share a row,
+    and the lease is stored in the row, so no lock or transaction is held while the rows are worked on.
+    A worker that crashes loses its claims once the lease runs out.
+
+    :param model: a mapped class with `id`, `claimed_by` and `claimed_until` columns
+    :param criteria: the rows to claim
+    :param now: the current time
+    :param lease: seconds the rows are held for
+    :param order_by: the order rows are picked in when limited
+    :param limit: the most rows claimed
+    :param worker: the worker claiming the rows
+    :return: an update statement returning the claimed model rows, in no particular order
+    """
+    picked = (
+        select(model.id)
+        .where(*criteria, claimable(model, now))
+        .order_by(*order_by)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return (
+        update(model)
+        .where(model.id.in_(picked.scalar_subquery()))
+        .values(claimed_by=worker, claimed_until=now + timedelta(seconds=lease))
+        .returning(model)
+        .execution_options(synchronize_session=False)
+    )
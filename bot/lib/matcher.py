@@ -0,0 +1,289 @@
+import asyncio
+import json
+import re
+import sys
+from typing import Callable
+
+try:  # python 3.11+
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_constants
+    import sre_parse
+
+# character classes larger than this are not worth checking before running the regex
+MAX_PREFILTER_CHARS = 4
+# longest literal taken from a single repeated character, e.g. A{100}
+MAX_PREFILTER_RUN = 16
+# shorter literals are found in most messages, so checking them costs more than it saves
+MIN_PREFILTER_LITERAL = 3
+# only the start of a message is scanned, longer messages can't make a slow pattern slower
+# (discord messages are at most 2000 characters without nitro)
+MAX_SCAN_LENGTH = 2000
+# total time a pattern may take to scan all of the adversarial inputs
+REGEX_TIME_BUDGET = 0.1
+# allowance for starting the python process that times the pattern
+REGEX_STARTUP_TIMEOUT = 5
+# allowance for scheduling delays on top of the budget before the timing process is killed
+REGEX_TIMEOUT_SLACK = 0.5
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, "POSSESSIVE_REPEAT"):  # python 3.11+
+    _REPEATS.add(sre_constants.POSSESSIVE_REPEAT)
+
+
+def _requirements(subpattern) -> list[tuple[str, ...]]:
+    """
+    Walk a parsed pattern and collect the literals that every match must contain.
+
+    Each requirement is a tuple of alternatives, at least one of which must be in the text:
+    a literal run is a single string, a character class is one string per character.
+
+    :param subpattern: a parsed (sub)pattern from sre_parse
+    :return: the requirements of the pattern
+    """
+    found = []
+    run = []
+
+    def end_run():
+        if run:
+            found.append(("".join(run),))
+            run.clear()
+
+    for op, av in subpattern:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        if op in _REPEATS:
+            min_repeat, max_repeat, item = av
+            if min_repeat > 0 and len(item) == 1 and item[0][0] is sre_constants.LITERAL:
+                # e.g. A{4,} continues the current literal run with AAAA
+                run.append(chr(item[0][1]) * min(min_repeat, MAX_PREFILTER_RUN))
+                # a run cut short or followed by more repeats isn't next to what comes after it
+                if max_repeat != min_repeat or min_repeat > MAX_PREFILTER_RUN:
+                    end_run()
+                continue
+            end_run()
+            if min_repeat > 0:
+                found.extend(_requirements(item))
+            continue
+        end_run()
+        if op is sre_constants.IN:
+            chars = []
+            for item_op, item_av in av:
+                if item_op is sre_constants.LITERAL:
+                    chars.append(chr(item_av))
+                elif item_op is sre_constants.RANGE and item_av[1] - item_av[0] < MAX_PREFILTER_CHARS:
+                    chars.extend(chr(c) for c in range(item_av[0], item_av[1] + 1))
+                else:
+                    # negated sets and categories (\d, \w, ...) can't be prefiltered
+                    break
+            else:
+                if 0 < len(chars) <= MAX_PREFILTER_CHARS:
+                    found.append(tuple(dict.fromkeys(chars)))
+        elif op is sre_constants.SUBPATTERN:
+            _, add_flags, _, item = av
+            if not add_flags & sre_constants.SRE_FLAG_IGNORECASE:
+                found.extend(_requirements(item))
+        elif op is getattr(sre_constants, "ATOMIC_GROUP", None):
+            found.extend(_requirements(av))
+    end_run()
+    return found
+
+
+def literal_prefilter(pattern: re.Pattern) -> tuple[tuple[str, ...], ...]:
+    """
+    Find cheap literal checks that a string must pass to match the pattern.
+
+    Every returned requirement must be met, and a requirement is met if any of its strings are in the text.
+    e.g. `(?:\w+\s+)*AAAA+` requires 'AAAA' (the longest literal run). Patterns starting with a literal,
+    like `:scream1:`, aren't prefiltered as the regex engine already skips ahead to it.
+
+    :param pattern: the compiled pattern
+    :return: the requirements, most selective first, or an empty tuple if the pattern isn't worth prefiltering
+    """
+    if pattern.flags & re.IGNORECASE:
+        return ()
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except re.error:
+        return ()
+    if parsed and parsed[0][0] is sre_constants.LITERAL:
+        return ()
+    found = list(dict.fromkeys(_requirements(parsed)))
+    if parsed and parsed[0][0] is sre_constants.IN and found and len(found[0]) > 1:
+        # the regex engine already skips ahead to a leading character class, checking it again only costs time
+        found.pop(0)
+    # prefer long literal runs, then small character classes
+    found.sort(key=lambda req: (-len(req[0]) if len(req) == 1 else 0, len(req)))
+    if not found or len(found[0]) > 1 or len(found[0][0]) < MIN_PREFILTER_LITERAL:
+        # only a long literal run rejects enough messages to pay for the checks
+        return ()
+    # a second check is only worth it if it is a literal run, wide classes rarely reject anything
+    return tuple(req for i, req in enumerate(found[:2]) if i == 0 or (len(req) == 1 and len(req[0]) > 1))
+
+
+def _check(pattern: re.Pattern, prefilter: tuple[tuple[str, ...], ...]) -> Callable[[str], bool]:
+    """
+    Build a function that checks the prefilter before searching for the pattern.
+    The prefilter is bound as closure variables to keep the per message cost down.
+    """
+    search = pattern.search
+    if not prefilter:
+        return lambda content: search(content, 0, MAX_SCAN_LENGTH) is not None
+    if len(prefilter) == 1 and len(prefilter[0]) == 1:
+        ((lit,),) = prefilter
+        return lambda content: lit in content and search(content, 0, MAX_SCAN_LENGTH) is not None
+
+    def check(content: str) -> bool:
+        for requirement in prefilter:
+            for lit in requirement:
+                if lit in content:
+                    break
+            else:
+                return False
+        return search(content, 0, MAX_SCAN_LENGTH) is not None
+
+    return check
+
+
+class ScreamMatcher:
+    """
+    Match a message against a primary and secondary pattern.
+
+    Each pattern has a literal prefilter so messages that can't match are rejected with
+    plain substring checks, and a regex is only run when its prefilter passes.
+    Only the first `MAX_SCAN_LENGTH` characters of a message are searched.
+    """
+
+    def __init__(self, primary: re.Pattern, secondary: re.Pattern) -> None:
+        self.primary = primary
+        self.secondary = secondary
+        self.primary_prefilter = literal_prefilter(primary)
+        self.secondary_prefilter = literal_prefilter(secondary)
+        self._check_primary = _check(primary, self.primary_prefilter)
+        self._check_secondary = _check(secondary, self.secondary_prefilter)
+        # without a prefilter the checks only add a call per message, callers on a hot path search directly
+        self.prefiltered = bool(self.primary_prefilter or self.secondary_prefilter)
+
+    def match(self, content: str) -> tuple[bool, bool]:
+        """
+        Check which of the patterns are in the content
+
+        :param content: the message content
+        :return: whether the primary and secondary pattern were found
+        """
+        return self._check_primary(content), self._check_secondary(content)
+
+
+def _pattern_chars(pattern: re.Pattern, limit: int = 16) -> list[str]:
+    """
+    Collect the characters a pattern refers to, the building blocks for inputs that make it backtrack.
+    """
+    chars = []
+
+    def walk(subpattern):
+        for op, av in subpattern:
+            if op is sre_constants.LITERAL:
+                chars.append(chr(av))
+            elif op is sre_constants.IN:
+                for item_op, item_av in av:
+                    if item_op is sre_constants.LITERAL:
+                        chars.append(chr(item_av))
+                    elif item_op is sre_constants.RANGE:
+                        chars.append(chr(item_av[0]))
+            elif op in _REPEATS:
+                walk(av[2])
+            elif op is sre_constants.SUBPATTERN:
+                walk(av[3])
+            elif op is sre_constants.BRANCH:
+                for branch in av[1]:
+                    walk(branch)
+
+    walk(sre_parse.parse(pattern.pattern, pattern.flags))
+    return list(dict.fromkeys(chars))[:limit]
+
+
+def adversarial_inputs(pattern: re.Pattern, length: int = MAX_SCAN_LENGTH) -> list[str]:
+    """
+    Build inputs that trigger catastrophic backtracking in common vulnerable patterns,
+    long runs of the characters the pattern accepts followed by one it doesn't.
+
+    :param pattern: the compiled pattern
+    :param length: the length of each input
+    :return: the inputs
+    """
+    # word, digit and space characters cover \w, \d, \s and . without any literals
+    chars = list(dict.fromkeys(_pattern_chars(pattern) + ["a", "0", " "]))
+    inputs = []
+    for char in chars:
+        inputs.append(char * (length - 1) + "\x00")
+    mixed = "".join(chars)
+    inputs.append((mixed * (length // len(mixed) + 1))[: length - 1] + "\x00")
+    for first, second in zip(chars, chars[1:]):
+        inputs.append(((first + second) * (length // 2 + 1))[: length - 1] + "\x00")
+    return inputs
+
+
+_TIMING_SCRIPT = """
+import json, re, sys, time
+job = json.load(sys.stdin)
+pattern = re.compile(job["pattern"], job["flags"])
+print("ready", flush=True)
+start = time.perf_counter()
+for text in job["inputs"]:
+    pattern.search(text, 0, job["endpos"])
+print(time.perf_counter() - start, flush=True)
+"""
+
+
+async def validate_pattern(pattern: str, budget: float = REGEX_TIME_BUDGET) -> re.Pattern:
+    """
+    Compile a user supplied pattern and make sure it can't stall the bot.
+
+    The pattern is timed against adversarial inputs in a separate python process,
+    as a regex that is stuck backtracking can't be interrupted from another thread.
+
+    :param pattern: the pattern to compile
+    :param budget: the time in seconds the pattern may take to scan all inputs
+    :raises re.error: if the pattern is invalid
+    :raises ValueError: if the pattern is too slow
+    :return: the compiled pattern
+    """
+    compiled = re.compile(pattern)
+    job = {
+        "pattern": compiled.pattern,
+        "flags": compiled.flags,
+        "inputs": adversarial_inputs(compiled),
+        "endpos": MAX_SCAN_LENGTH,
+    }
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-c",
+        _TIMING_SCRIPT,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        proc.stdin.write(json.dumps(job).encode())
+        await proc.stdin.drain()
+        proc.stdin.close()
+        # starting python is not part of the budget
+        ready = await asyncio.wait_for(proc.stdout.readline(), timeout=REGEX_STARTUP_TIMEOUT)
+        if ready.strip() != b"ready":
+            raise ValueError("pattern could not be timed")
+        try:
+            out = await asyncio.wait_for(proc.stdout.readline(), timeout=budget + REGEX_TIMEOUT_SLACK)
+        except asyncio.TimeoutError:
+            raise ValueError(f"pattern did not finish within {budget}s, it may backtrack catastrophically")
+    except asyncio.TimeoutError:
+        raise ValueError("pattern could not be timed")
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+    elapsed = float(out)
+    if elapsed > budget:
+        raise ValueError(f"pattern took {elapsed:.2f}s on adversarial input, the limit is {budget}s")
+    return compiled
@@ -0,0 +1,98 @@
+import asyncio
+from typing import Iterable
+
+import discord
+
+from bot.lib.cache import TTLCache
+
+UNKNOWN_NAME = "[Unknown]"
+# how long fetched names are reused before they are looked up again
+NAME_TTL = 60 * 60
+# fetched names kept in memory
+NAME_CACHE_SIZE = 4096
+# users that no longer exist are not looked up again for this long
+UNKNOWN_TTL = 24 * 60 * 60
+# concurrent REST lookups, discord.py waits out rate limits itself so this only limits the burst
+FETCH_CONCURRENCY = 5
+
+
+class NameResolver:
+    """
+    Resolve user ids to display names, avoiding the REST API where possible.
+
+    Names are looked up in order from the guild's member cache, the client's user cache,
+    names fetched previously and finally fetched from the API, concurrently for all the misses.
+    """
+
+    def __init__(self, client: discord.Client, ttl: float = NAME_TTL, maxsize: int = NAME_CACHE_SIZE) -> None:
+        self.client = client
+        self._fetched: TTLCache[int, str] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._fetching: dict[int, asyncio.Task] = {}
+        self._limit = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    def cached(self, uid: int, guild: discord.Guild | None = None) -> str | None:
+        """
+        Look up a name without making any requests
+
+        :param uid: the user id
+        :param guild: the guild to prefer member names (nicknames) from
+        :return: the name or None if it is not cached
+        """
+        if guild is not None and (member := guild.get_member(uid)) is not None:
+            return member.display_name
+        if (user := self.client.get_user(uid)) is not None:
+            return user.display_name
+        return self._fetched.get(uid)
+
+    async def _fetch(self, uid: int) -> str:
+        async with self._limit:
+            try:
+                user = await self.client.fetch_user(uid)
+            except discord.NotFound:
+                self._fetched.set(uid, UNKNOWN_NAME, ttl=UNKNOWN_TTL)
+                return UNKNOWN_NAME
+            except discord.HTTPException:
+                # not cached, it may succeed next time
+                return UNKNOWN_NAME
+        self._fetched.set(uid, user.display_name)
+        return user.display_name
+
+    async def _fetch_shared(self, uid: int) -> str:
+        # concurrent lookups for the same user share one request
+        task = self._fetching.get(uid)
+        if task is None:
+            task = self._fetching[uid] = asyncio.ensure_future(self._fetch(uid))
+            task.add_done_callback(lambda _: self._fetching.pop(uid, None))
+        return await asyncio.shield(task)
+
+    async def resolve(self, uid: int, guild: discord.Guild | None = None) -> str:
+        """
+        Get the display name for a user
+
+        :param uid: the user id
+        :param guild: the guild to prefer member names (nicknames) from
+        :return: the name, or UNKNOWN_NAME if the user could not be found
+        """
+        name = self.cached(uid, guild)
+        return name if name is not None else await self._fetch_shared(uid)
+
+    async def resolve_many(self, uids: Iterable[int], guild: discord.Guild | None = None) -> dict[int, str]:
+        """
+        Get the display names for several users, fetching the uncached ones concurrently
+
+        :param uids: the user ids
+        :param guild: the guild to prefer member names (nicknames) from
+        :return: user id -> name
+        """
+        names = {}
+        misses = []
+        for uid in dict.fromkeys(uids):
+            name = self.cached(uid, guild)
+            if name is None:
+                misses.append(uid)
+            else:
+                names[uid] = name
+        if misses:
+            fetched = await asyncio.gather(*(self._fetch_shared(uid) for uid in misses))
+            names.update(zip(misses, fetched))
+        return names
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable
+
+Job = Callable[[], Awaitable[None]]
+
+
+class IngestQueue:
+    """
+    A bounded queue of jobs run by a small pool of worker tasks, so event handlers only have to enqueue work.
+
+    When the queue is full jobs spill into a bounded overflow buffer that is moved back into the queue
+    as it drains. Once the overflow is full too new jobs are dropped. Every outcome is counted so the
+    backpressure can be monitored.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        log: logging.Logger,
+        maxsize: int = 1000,
+        workers: int = 4,
+        spill_size: int = 10_000,
+    ) -> None:
+        self.name = name
+        self.log = log
+        self.maxsize = maxsize
+        self.spill_size = spill_size
+        self._queue: asyncio.Queue[Job] = asyncio.Queue(maxsize)
+        self._spill: deque[Job] = deque()
+        self._workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self.closed = False
+        # metrics
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    @property
+    def depth(self) -> int:
+        """
+        The number of jobs waiting to run
+        """
+        return self._queue.qsize() + len(self._spill)
+
+    def start(self) -> None:
+        """
+        Start the workers
+        """
+        self.closed = False
+        self._tasks = [asyncio.create_task(self._work(), name=f"{self.name}-{i}") for i in range(self._workers)]
+
+    def put(self, job: Job) -> bool:
+        """
+        Add a job without waiting
+
+        :param job: a coroutine function taking no arguments
+        :return bool: False if the job was dropped
+        """
+        if self.closed:
+            self.dropped += 1
+            return False
+        if not self._spill:
+            try:
+                self._queue.put_nowait(job)
+                self.enqueued += 1
+                self.high_water = max(self.high_water, self.depth)
+                return True
+            except asyncio.QueueFull:
+                self.log.warning(f"{self.name} queue is full, spilling jobs")
+        if len(self._spill) >= self.spill_size:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                self.log.warning(f"{self.name} queue overflow is full, {self.dropped} jobs dropped so far")
+            return False
+        # once spilling, jobs keep going to the overflow so they run in order
+        self._spill.append(job)
+        self.enqueued += 1
+        self.spilled += 1
+        self.high_water = max(self.high_water, self.depth)
+        return True
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            if self._spill:
+                self._queue.put_nowait(self._spill.popleft())
+            try:
+                await job()
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                self.log.error(f"{self.name} job failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def join(self, timeout: float | None = None) -> bool:
+        """
+        Wait for the queued jobs to finish, without stopping the workers or refusing new jobs
+
+        :param timeout: the most seconds to wait
+        :return bool: False if jobs were still running after the timeout
+        """
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def drain(self, timeout: float | None = None) -> None:
+        """
+        Stop accepting jobs, wait for the queued ones to finish and stop the workers
+
+        :param timeout: the most seconds to wait, remaining jobs are abandoned after it
+        """
+        self.closed = True
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                self.log.warning(f"{self.name} queue did not drain in {timeout}s, abandoning {self.depth} jobs")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,103 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, TypeVar
+
+C = TypeVar("C")
+
+# guild configs kept in memory per module, the least recently used are loaded again on their next use
+REGISTRY_SIZE = 1024
+
+
+class ConfigRegistry(Generic[C]):
+    """
+    The guild configs of a module, loaded from the database the first time a guild uses them.
+
+    Configs are kept in a least recently used cache of at most `maxsize` guilds, so memory and startup time
+    depend on the number of active guilds rather than every guild the bot is in. Evicted configs are loaded
+    again on their next use, so changes must be saved to the database as well as made to the config.
+    """
+
+    def __init__(self, load: Callable[[int], Awaitable[C]], maxsize: int = REGISTRY_SIZE) -> None:
+        """
+        :param load: coroutine function building the config of a guild id, a default config if none is stored
+        :param maxsize: the most configs kept in memory
+        """
+        self._load = load
+        self.maxsize = maxsize
+        # guild id -> config, least recently used first
+        self._configs: OrderedDict[int, C] = OrderedDict()
+        self._loading: dict[int, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._configs)
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._configs
+
+    def peek(self, guild_id: int) -> C | None:
+        """
+        Look up a loaded config without loading it or changing the LRU order
+
+        :param guild_id: the guild id
+        :return: the config or None if it is not loaded
+        """
+        return self._configs.get(guild_id)
+
+    async def get(self, guild_id: int) -> C:
+        """
+        Get the config of a guild, loading it if it is not in memory
+
+        :param guild_id: the guild id
+        :return: the config
+        """
+        config = self._configs.get(guild_id)
+        if config is not None:
+            self.hits += 1
+            self._configs.move_to_end(guild_id)
+            return config
+        self.misses += 1
+        # concurrent lookups for the same guild share one load
+        task = self._loading.get(guild_id)
+        if task is None:
+            task = self._loading[guild_id] = asyncio.ensure_future(self._load_config(guild_id))
+            task.add_done_callback(lambda done: self._loaded(guild_id, done))
+        return await asyncio.shield(task)
+
+    async def _load_config(self, guild_id: int) -> C:
+        config = await self._load(guild_id)
+        # not cached if the guild was forgotten while loading
+        if self._loading.get(guild_id) is asyncio.current_task():
+            self.set(guild_id, config)
+        return config
+
+    def _loaded(self, guild_id: int, task: asyncio.Task) -> None:
+        if self._loading.get(guild_id) is task:
+            del self._loading[guild_id]
+
+    def set(self, guild_id: int, config: C) -> None:
+        """
+        Store a config, evicting the least recently used one if the registry is full
+
+        :param guild_id: the guild id
+        :param config: the config
+        """
+        self._configs[guild_id] = config
+        self._configs.move_to_end(guild_id)
+        while len(self._configs) > self.maxsize:
+            self._configs.popitem(last=False)
+
+    def pop(self, guild_id: int) -> C | None:
+        """
+        Forget the config of a guild, e.g. when the bot leaves it, it is loaded again on its next use
+
+        :param guild_id: the guild id
+        :return: the removed config or None if it was not loaded
+        """
+        self._loading.pop(guild_id, None)
+        return self._configs.pop(guild_id, None)
+
+    def clear(self) -> None:
+        self._loading.clear()
+        self._configs.clear()
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+import discord
+
+Handler = Callable[[discord.Message], Awaitable[None]]
+Predicate = Callable[[discord.Message], bool]
+
+
+class MessageRouter:
+    """
+    Route messages only to the handlers registered for their channel, instead of every cog listening to every message.
+
+    Handlers are registered for a channel id, looked up with a single dict lookup per message, or for a predicate
+    that is checked for every message, for the few handlers that can't be tied to a set of channels.
+    Channel ids are unique across guilds, so they are enough to route a (guild, channel) pair.
+    """
+
+    def __init__(self, log: logging.Logger) -> None:
+        self.log = log
+        # channel id -> handlers, replaced rather than modified so a handler can unregister itself during dispatch
+        self._channels: dict[int, tuple[Handler, ...]] = {}
+        self._predicates: list[tuple[Predicate, Handler]] = []
+        # running dispatches started by `schedule`, referenced until they finish so they aren't garbage collected
+        self.tasks: set[asyncio.Task] = set()
+        self.dispatched = 0
+
+    def add_channel(self, channel_id: int, handler: Handler) -> None:
+        """
+        Send the messages of a channel to a handler
+
+        :param channel_id: the channel id
+        :param handler: coroutine function taking the message
+        """
+        handlers = self._channels.get(channel_id, ())
+        if handler not in handlers:
+            self._channels[channel_id] = handlers + (handler,)
+
+    def remove_channel(self, channel_id: int, handler: Handler) -> None:
+        """
+        Stop sending the messages of a channel to a handler
+
+        :param channel_id: the channel id
+        :param handler: the registered handler
+        """
+        handlers = self._channels.get(channel_id)
+        if handlers is None or handler not in handlers:
+            return
+        handlers = tuple(h for h in handlers if h != handler)
+        if handlers:
+            self._channels[channel_id] = handlers
+        else:
+            del self._channels[channel_id]
+
+    def add_predicate(self, predicate: Predicate, handler: Handler) -> None:
+        """
+        Send every message the predicate is true for to a handler
+
+        :param predicate: function taking the message, checked for every message so it should be cheap
+        :param handler: coroutine function taking the message
+        """
+        self._predicates.append((predicate, handler))
+
+    def remove_handler(self, handler: Handler) -> None:
+        """
+        Remove every registration of a handler, e.g. when its cog is unloaded
+
+        :param handler: the registered handler
+        """
+        for channel_id in [cid for cid, handlers in self._channels.items() if handler in handlers]:
+            self.remove_channel(channel_id, handler)
+        self._predicates = [(p, h) for p, h in self._predicates if h != handler]
+
+    def channels(self, handler: Handler) -> set[int]:
+        """
+        :param handler: the registered handler
+        :return: the ids of the channels routed to the handler
+        """
+        return {cid for cid, handlers in self._channels.items() if handler in handlers}
+
+    def handlers(self, message: discord.Message) -> tuple[Handler, ...]:
+        """
+        :param message: the message
+        :return: the handlers the message is routed to
+        """
+        handlers = self._channels.get(message.channel.id, ())
+        if self._predicates:
+            extra = [handler for predicate, handler in self._predicates if predicate(message)]
+            if extra:
+                handlers += tuple(extra)
+        return handlers
+
+    def schedule(self, message: discord.Message) -> asyncio.Task | None:
+        """
+        Dispatch a message in its own task, like discord.py runs listeners, so slow handlers don't hold up the
+        caller, e.g. the commands in the message. No task is started if no handler is registered for it.
+
+        :param message: the message
+        :return: the task or None if the message isn't routed anywhere
+        """
+        handlers = self.handlers(message)
+        if not handlers:
+            return None
+        task = asyncio.create_task(self._run(message, handlers), name="router-dispatch")
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def dispatch(self, message: discord.Message) -> None:
+        """
+        Run the handlers for a message one after another, an exception in one is logged and doesn't stop the others
+
+        :param message: the message
+        """
+        handlers = self.handlers(message)
+        if handlers:
+            await self._run(message, handlers)
+
+    async def _run(self, message: discord.Message, handlers: tuple[Handler, ...]) -> None:
+        self.dispatched += 1
+        for handler in handlers:
+            try:
+                await handler(message)
+            except Exception:
+                self.log.exception(f"Message handler {handler.__qualname__} failed")
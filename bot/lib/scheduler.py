@@ -0,0 +1,170 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+from bot.lib.date import now_tz
+
+K = TypeVar("K", bound=Hashable)
+
+# how often the scheduled times are reloaded from the source of truth, in case any were changed elsewhere
+RECONCILE_INTERVAL = 15 * 60
+
+
+class Scheduler(Generic[K]):
+    """
+    Run a callback when keys become due, sleeping until exactly the earliest due time instead of polling.
+
+    Due times are kept in a min-heap. Rescheduling or cancelling a key doesn't search the heap, the old entry is
+    skipped when it reaches the top. A single task sleeps until the top entry is due and is woken early when an
+    earlier key is scheduled. Every `reconcile_interval` seconds the `reconcile` callback is run as a safety net,
+    e.g. to reload the keys from the database.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        log: logging.Logger,
+        callback: Callable[[list[K]], Awaitable[None]],
+        reconcile: Callable[[], Awaitable[None]] | None = None,
+        reconcile_interval: float = RECONCILE_INTERVAL,
+    ) -> None:
+        """
+        :param name: the name of the task
+        :param log: the logger
+        :param callback: coroutine function run with the keys that are due, in due order
+        :param reconcile: coroutine function run every `reconcile_interval` seconds
+        :param reconcile_interval: seconds between reconciles
+        """
+        self.name = name
+        self.log = log
+        self._callback = callback
+        self._reconcile = reconcile
+        self.reconcile_interval = reconcile_interval
+        # (due time, insertion order, key), the order keeps keys due at the same time from being compared
+        self._heap: list[tuple[datetime, int, K]] = []
+        self._counter = itertools.count()
+        # key -> due time, an entry in the heap is stale unless it matches this
+        self._due: dict[K, datetime] = {}
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # metrics
+        self.fired = 0
+        self.reconciles = 0
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._due
+
+    def keys(self) -> list[K]:
+        """
+        The scheduled keys, in no particular order
+        """
+        return list(self._due)
+
+    def when(self, key: K) -> datetime | None:
+        """
+        :param key: the key
+        :return: the due time of the key, None if it isn't scheduled
+        """
+        return self._due.get(key)
+
+    @property
+    def next_due(self) -> datetime | None:
+        """
+        The earliest due time, None if nothing is scheduled
+        """
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+
+    def schedule(self, key: K, when: datetime) -> None:
+        """
+        Schedule a key, replacing its previous due time
+
+        :param key: the key
+        :param when: the aware due time, keys that are already due run right away
+        """
+        self._due[key] = when
+        heapq.heappush(self._heap, (when, next(self._counter), key))
+        if self._heap[0][2] == key:
+            self._wake.set()
+
+    def cancel(self, key: K) -> bool:
+        """
+        Unschedule a key
+
+        :param key: the key
+        :return bool: False if the key wasn't scheduled
+        """
+        return self._due.pop(key, None) is not None
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._due.clear()
+
+    def start(self) -> None:
+        """
+        Start the task running the callbacks
+        """
+        self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        """
+        Stop the task, the scheduled keys are kept
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def _prune(self) -> None:
+        # drop cancelled and rescheduled entries from the top of the heap
+        heap, due = self._heap, self._due
+        while heap and due.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def _pop_due(self, now: datetime) -> list[K]:
+        keys = []
+        self._prune()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key = heapq.heappop(self._heap)
+            del self._due[key]
+            keys.append(key)
+            self._prune()
+        return keys
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_reconcile = loop.time() + self.reconcile_interval
+        while True:
+            self._wake.clear()
+            if self._reconcile is not None and loop.time() >= next_reconcile:
+                next_reconcile = loop.time() + self.reconcile_interval
+                self.reconciles += 1
+                try:
+                    await self._reconcile()
+                except Exception as e:
+                    self.log.error(f"{self.name} reconcile failed: {e}")
+            now = now_tz()
+            keys = self._pop_due(now)
+            if keys:
+                self.fired += len(keys)
+                try:
+                    await self._callback(keys)
+                except Exception as e:
+                    self.log.error(f"{self.name} callback failed: {e}")
+                # more keys may have become due while the callback ran
+                continue
+            delay = next_reconcile - loop.time() if self._reconcile is not None else None
+            if (when := self.next_due) is not None:
+                until_due = (when - now).total_seconds()
+                delay = until_due if delay is None else min(delay, until_due)
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass